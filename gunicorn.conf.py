@@ -0,0 +1,74 @@
+"""
+gunicorn hooks: load the app once in the master, warm up templates and URLs
+there so forked workers share them, open each worker's database connection
+before it accepts traffic, flush its buffered post views when it exits, and
+log startup and first-request latency.
+
+The worker class is GUNICORN_WORKER_CLASS, sync by default. The /updates
+long-poll is routed to a separate server of thepost.asgi with uvicorn workers,
+where it waits on the event loop rather than holding a worker. pre_request and
+post_request are only called by gunicorn's own workers, so first requests are
+not logged there.
+"""
+
+import os
+import time
+
+preload_app = True
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+
+
+def on_starting(server):
+    server.started_at = time.monotonic()
+
+
+def when_ready(server):
+    from thepost import warmup
+
+    started = time.monotonic()
+    templates = warmup.warm_templates()
+    warmup.warm_urls()
+    server.log.info(
+        "Master ready in %.0f ms, warm-up of %d templates and URLs took %.0f ms",
+        (time.monotonic() - server.started_at) * 1000,
+        templates,
+        (time.monotonic() - started) * 1000,
+    )
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    from thepost import warmup
+
+    warmup.warm_database()
+    worker.log.info(
+        "Worker %s ready in %.0f ms",
+        worker.pid,
+        (time.monotonic() - worker.forked_at) * 1000,
+    )
+
+
+def worker_exit(server, worker):
+    from posts.viewcounts import view_counter
+
+    view_counter.flush()
+
+
+def pre_request(worker, req):
+    if not hasattr(worker, "first_request_started_at"):
+        worker.first_request_started_at = time.monotonic()
+
+
+def post_request(worker, req, environ, resp):
+    if not getattr(worker, "first_request_logged", False):
+        worker.first_request_logged = True
+        worker.log.info(
+            "Worker %s served its first request, %s %s, in %.0f ms",
+            worker.pid,
+            req.method,
+            req.path,
+            (time.monotonic() - worker.first_request_started_at) * 1000,
+        )
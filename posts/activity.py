@@ -0,0 +1,171 @@
+import datetime as dt
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import Comment, Follow, GroupActivity, Post, UserActivity
+
+USER_TABLE, GROUP_TABLE = UserActivity._meta.db_table, GroupActivity._meta.db_table
+
+# Merges the rows of every subject and day in [since, until) that has more
+# than one into a single row.
+COMPACT_SQL = """
+    WITH merged AS (
+        DELETE FROM {table}
+        WHERE ({subject}, date) IN (
+            SELECT {subject}, date FROM {table}
+            WHERE date >= %(since)s AND date < %(until)s
+            GROUP BY {subject}, date HAVING COUNT(*) > 1
+        )
+        RETURNING {subject}, date, {counters}
+    )
+    INSERT INTO {table} ({subject}, date, {counters})
+    SELECT {subject}, date, {sums} FROM merged GROUP BY {subject}, date
+"""
+
+# Recomputes the rows of every subject and day in [since, until) from the
+# posts, comments and follows, after the old rows are deleted.
+BACKFILL_USER_SQL = f"""
+    INSERT INTO {USER_TABLE} (user_id, date, posts, comments, followers)
+    SELECT user_id, date, SUM(posts), SUM(comments), SUM(followers) FROM (
+        SELECT author_id AS user_id, date::date AS date,
+            1 AS posts, 0 AS comments, 0 AS followers
+        FROM posts_post WHERE date >= %(since)s AND date < %(until)s
+        UNION ALL
+        SELECT author_id, date::date, 0, 1, 0
+        FROM posts_comment WHERE date >= %(since)s AND date < %(until)s
+        UNION ALL
+        SELECT followee_id, date::date, 0, 0, 1
+        FROM posts_follow WHERE date >= %(since)s AND date < %(until)s
+    ) events
+    GROUP BY user_id, date
+"""
+BACKFILL_GROUP_SQL = f"""
+    INSERT INTO {GROUP_TABLE} (group_id, date, posts, comments)
+    SELECT group_id, date, SUM(posts), SUM(comments) FROM (
+        SELECT group_id, date::date AS date, 1 AS posts, 0 AS comments
+        FROM posts_post
+        WHERE group_id IS NOT NULL AND date >= %(since)s AND date < %(until)s
+        UNION ALL
+        SELECT p.group_id, c.date::date, 0, 1
+        FROM posts_comment c JOIN posts_post p ON p.id = c.post_id
+        WHERE p.group_id IS NOT NULL AND c.date >= %(since)s AND c.date < %(until)s
+    ) events
+    GROUP BY group_id, date
+"""
+
+
+def _compact_sql(table, subject, counters):
+    return COMPACT_SQL.format(
+        table=table,
+        subject=subject,
+        counters=", ".join(counters),
+        sums=", ".join(f"SUM({counter})" for counter in counters),
+    )
+
+
+def compact(since, until):
+    """
+    Merges the rows appended for each subject and day between the dates.
+    Rows appended meanwhile are left for the next compaction.
+    """
+    params = {"since": since, "until": until}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _compact_sql(USER_TABLE, "user_id", ["posts", "comments", "followers"]),
+            params,
+        )
+        users = cursor.rowcount
+        cursor.execute(
+            _compact_sql(GROUP_TABLE, "group_id", ["posts", "comments"]), params
+        )
+        return users + cursor.rowcount
+
+
+def backfill(since, until):
+    """
+    Replaces the rows between the dates by ones computed from the posts,
+    comments and follows of those days.
+    """
+    params = {"since": since, "until": until}
+    with transaction.atomic(), connection.cursor() as cursor:
+        UserActivity.objects.filter(date__gte=since, date__lt=until).delete()
+        GroupActivity.objects.filter(date__gte=since, date__lt=until).delete()
+        cursor.execute(BACKFILL_USER_SQL, params)
+        cursor.execute(BACKFILL_GROUP_SQL, params)
+
+
+def _daily(queryset, counters, days):
+    """
+    Sums of the counters per day over the last `days` days, oldest first,
+    from one range query.
+    """
+    today = timezone.now().date()
+    since = today - dt.timedelta(days=days - 1)
+    rows = {
+        row["date"]: row
+        for row in queryset.filter(date__gte=since)
+        .values("date")
+        .annotate(**{f"total_{counter}": Sum(counter) for counter in counters})
+    }
+    return [
+        {
+            "date": date,
+            **{
+                counter: rows.get(date, {}).get(f"total_{counter}", 0)
+                for counter in counters
+            },
+        }
+        for date in (since + dt.timedelta(days=i) for i in range(days))
+    ]
+
+
+def user_activity(user, days=None):
+    return _daily(
+        UserActivity.objects.filter(user=user),
+        ["posts", "comments", "followers"],
+        days or settings.ACTIVITY_DAYS,
+    )
+
+
+def group_activity(group, days=None):
+    return _daily(
+        GroupActivity.objects.filter(group=group),
+        ["posts", "comments"],
+        days or settings.ACTIVITY_DAYS,
+    )
+
+
+def record_post(sender, instance, created, **kwargs):
+    if not created:
+        return
+    date = instance.date.date()
+    UserActivity.objects.create(user_id=instance.author_id, date=date, posts=1)
+    if instance.group_id:
+        GroupActivity.objects.create(group_id=instance.group_id, date=date, posts=1)
+
+
+def record_comment(sender, instance, created, **kwargs):
+    if not created:
+        return
+    date = instance.date.date()
+    UserActivity.objects.create(user_id=instance.author_id, date=date, comments=1)
+    if instance.post.group_id:
+        GroupActivity.objects.create(
+            group_id=instance.post.group_id, date=date, comments=1
+        )
+
+
+def record_follow(sender, instance, created, **kwargs):
+    if created:
+        UserActivity.objects.create(
+            user_id=instance.followee_id, date=instance.date.date(), followers=1
+        )
+
+
+post_save.connect(record_post, sender=Post)
+post_save.connect(record_comment, sender=Comment)
+post_save.connect(record_follow, sender=Follow)
@@ -1,14 +1,133 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
-from .models import Comment, Follow, Group, Post
+from .caching import author_tags, cache_tags, invalidate
+from .models import Comment, Follow, Group, Hashtag, Post, User, UserDeletion
+from .tiered import tiered_cache
+
+# Unfiltered changelists of tables estimated to be larger than this show the
+# planner's row estimate instead of running COUNT(*).
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the count of unfiltered querysets over large tables
+    from PostgreSQL's statistics.
+    """
+
+    @cached_property
+    def count(self):
+        if connection.vendor == "postgresql" and not self.object_list.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [self.object_list.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    List filter rendered as a text input and applied as an exact .lookup,
+    for relations with too many rows to enumerate as filter choices.
+    """
+
+    template = "admin/input_filter.html"
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        # A filter without lookups is not displayed.
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value()})
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice["query_parts"] = [
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        ]
+        yield all_choice
+
+
+class AuthorFilter(InputFilter):
+    title = "author username"
+    parameter_name = "author"
+    lookup = "author__username"
+
+
+class GroupFilter(InputFilter):
+    title = "group slug"
+    parameter_name = "group"
+    lookup = "group__slug"
+
+
+class SoftDeleteMixin:
+    """
+    Mixin for admins of models with many dependents to mark objects deleted
+    with .soft_delete instead of collecting and deleting their dependents in
+    one transaction; purge_deleted removes them later in batches. Admins
+    set .soft_delete_values, the field values marking an object deleted.
+    """
+
+    def soft_delete(self, queryset):
+        queryset.update(**self.soft_delete_values)
+
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        self.soft_delete(type(obj).objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.soft_delete(queryset)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base admin for tables that grow without bound.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ("text", "date", "author")
-    search_fields = ("text",)
-    list_filter = ("date", "group", "author")
+class PostAdmin(SoftDeleteMixin, LargeTableAdmin):
+    list_display = ("text", "date", "author", "is_deleted")
+    list_select_related = ("author",)
+    # Exact matches only, "#tag" through the hashtag index: text is not indexed.
+    search_fields = ("=author__username",)
+    # Dates as a filter of fixed ranges rather than a date hierarchy, which
+    # lists the dates of the whole table.
+    list_filter = (AuthorFilter, GroupFilter, "is_deleted", "date")
+    autocomplete_fields = ("author", "group")
     empty_value_display = "-"
+    soft_delete_values = {"is_deleted": True}
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term.startswith("#"):
+            tagged = Hashtag.objects.filter(
+                tag=search_term[1:].lower(), comment=None
+            ).values("post_id")
+            return queryset.filter(id__in=tagged), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def soft_delete(self, queryset):
+        # Loaded first, as the queryset may be filtered on is_deleted.
+        posts = list(queryset.select_related("author", "group"))
+        super().soft_delete(queryset)
+        invalidate(*{tag for post in posts for tag in cache_tags(post)})
 
 
 @admin.register(Group)
@@ -18,12 +137,42 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ("followee", "follower")
-    search_fields = ("followee", "follower")
+    list_select_related = ("followee", "follower")
+    search_fields = ("=followee__username", "=follower__username")
+    autocomplete_fields = ("followee", "follower")
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ("author", "date", "post", "text")
-    search_fields = ("author",)
+    list_select_related = ("author", "post__author")
+    search_fields = ("=author__username",)
+    list_filter = (AuthorFilter, "date")
+    autocomplete_fields = ("author",)
+    raw_id_fields = ("post",)
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class SoftDeleteUserAdmin(SoftDeleteMixin, UserAdmin):
+    soft_delete_values = {"is_active": False}
+
+    def soft_delete(self, queryset):
+        users = list(queryset)
+        super().soft_delete(queryset)
+        # update() sends no signals, the lookups of the users are dropped here.
+        tiered_cache.invalidate(*(f"user:{user.username}" for user in users))
+        invalidate(*author_tags(users))
+        UserDeletion.objects.bulk_create(
+            [UserDeletion(user_id=user.pk) for user in users], ignore_conflicts=True
+        )
+
+
+@admin.register(UserDeletion)
+class UserDeletionAdmin(admin.ModelAdmin):
+    list_display = ("user", "date")
+    list_select_related = ("user",)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = "posts"
+
+    def ready(self):
+        # Connects the signal receivers that keep the activity rollups.
+        from . import activity  # noqa: F401
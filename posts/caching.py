@@ -0,0 +1,234 @@
+import hashlib
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .models import Comment, Follow, Group, Hashtag, Post, User
+
+STATS = ("hits", "misses", "stampedes", "stale_served")
+
+# Seconds between checks for a value being computed by another worker.
+LOCK_POLL_INTERVAL = 0.05
+
+# Seconds between flushes of a worker's counters to the shared ones.
+STATS_FLUSH_INTERVAL = 5
+
+
+class StatsCounter:
+    """
+    Per-process counters of lookups, added to the counters shared by all
+    workers at most every STATS_FLUSH_INTERVAL seconds rather than with two
+    round trips to the cache per lookup.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(STATS, 0)
+        self.flushed_at = time.monotonic()
+
+    def count(self, stat):
+        with self.lock:
+            self.counts[stat] += 1
+            due = time.monotonic() - self.flushed_at >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, dict.fromkeys(STATS, 0)
+            self.flushed_at = time.monotonic()
+        for stat, count in counts.items():
+            if count:
+                cache.add(f"swr:stats:{stat}", 0, None)
+                try:
+                    cache.incr(f"swr:stats:{stat}", count)
+                except ValueError:
+                    # Evicted in between, losing some counts is fine.
+                    pass
+
+
+stats_counter = StatsCounter()
+
+
+def stats():
+    """
+    Counters shared by all workers, as of their last flush: fresh hits,
+    misses that computed the value, stampedes collapsed into another
+    worker's computation, and how many of those were answered with a stale
+    value.
+    """
+    stats_counter.flush()
+    values = cache.get_many([f"swr:stats:{stat}" for stat in STATS])
+    return {stat: values.get(f"swr:stats:{stat}", 0) for stat in STATS}
+
+
+def cache_tags(post):
+    """
+    Cache tags of the feeds the post appears in, rendered as pages or as
+    syndication feeds. Tag feeds are tagged by their hashtag and invalidated
+    when texts are indexed.
+    """
+    tags = ["posts:all", f"posts:user:{post.author.username}"]
+    if post.group:
+        tags.append(f"posts:group:{post.group.slug}")
+    return tags
+
+
+def author_tags(users):
+    """
+    Cache tags of the profiles of the users and of every feed their posts
+    appear in, for changes to how or whether their posts are shown.
+    """
+    posts = Post.objects.filter(author__in=users)
+    return [
+        "posts:all",
+        *(f"user:{user.username}" for user in users),
+        *(f"posts:user:{user.username}" for user in users),
+        *(
+            f"posts:group:{slug}"
+            for slug in Group.objects.filter(posts__in=posts)
+            .values_list("slug", flat=True)
+            .distinct()
+        ),
+        *(
+            f"posts:tag:{tag}"
+            for tag in Hashtag.objects.filter(post__in=posts, comment=None)
+            .values_list("tag", flat=True)
+            .distinct()
+        ),
+    ]
+
+
+def invalidate(*tags):
+    """
+    Marks every value cached with any of the tags stale. Stale values are
+    still served while a single worker recomputes them.
+    """
+    for tag in tags:
+        key = f"swr:tag:{tag}"
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+
+def get_or_compute(key, compute, timeout, tags=()):
+    """
+    Returns the value cached under `key`, calling `compute` to cache it for
+    about `timeout` seconds, jittered so that keys cached together do not
+    expire together. Once it expires, or any of `tags` is invalidated, only
+    the worker that takes the key's lock recomputes it; the others get the
+    stale value, kept for CACHE_STALE_TIMEOUT seconds past expiry, or wait up
+    to CACHE_LOCK_TIMEOUT seconds when there is none.
+    """
+    entry_key, lock_key = f"swr:value:{key}", f"swr:lock:{key}"
+    tag_keys = [f"swr:tag:{tag}" for tag in tags]
+    found = cache.get_many([entry_key, *tag_keys])
+    entry, versions = found.get(entry_key), [found.get(tag, 0) for tag in tag_keys]
+    if entry and entry[1] > time.time() and entry[2] == versions:
+        stats_counter.count("hits")
+        return entry[0]
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    locked = cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT)
+    if not locked:
+        stats_counter.count("stampedes")
+        if entry:
+            stats_counter.count("stale_served")
+            return entry[0]
+        while entry is None and time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(entry_key)
+        if entry:
+            return entry[0]
+    stats_counter.count("misses")
+    try:
+        value = compute()
+        fresh_for = timeout * random.uniform(1 - settings.CACHE_JITTER, 1)
+        cache.set(
+            entry_key,
+            (value, time.time() + fresh_for, versions),
+            fresh_for + settings.CACHE_STALE_TIMEOUT,
+        )
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def cached_response(request, render, timeout=None, tags=()):
+    """
+    Returns the response `render` returns for the request's full path,
+    cached with get_or_compute. For viewer-independent pages only.
+    """
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return get_or_compute(
+        f"page:{path}",
+        render,
+        settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout,
+        tags=tags,
+    )
+
+
+class CachedViewMixin:
+    """
+    Mixin for viewer-independent list views to serve GET requests with
+    cached_response, so that a hot page is rendered once per
+    PAGE_CACHE_TIMEOUT however many workers serve it. The page is
+    invalidated with the tags in ._cache_tags.
+    """
+
+    def _cache_tags(self):
+        return ()
+
+    def get(self, request, *args, **kwargs):
+        get = super().get
+        return cached_response(
+            request,
+            lambda: get(request, *args, **kwargs).render(),
+            tags=self._cache_tags(),
+        )
+
+
+def invalidate_post(sender, instance, **kwargs):
+    invalidate(*cache_tags(instance))
+
+
+def invalidate_comment(sender, instance, **kwargs):
+    # Comment counts are shown with the post.
+    post = Post.objects.select_related("author", "group").filter(pk=instance.post_id)
+    if post:
+        invalidate(*cache_tags(post[0]))
+
+
+def invalidate_follow(sender, instance, **kwargs):
+    # Follower and followee counts are shown on both profiles.
+    usernames = User.objects.filter(
+        pk__in=(instance.followee_id, instance.follower_id)
+    ).values_list("username", flat=True)
+    invalidate(*(f"user:{username}" for username in usernames))
+
+
+def invalidate_group(sender, instance, **kwargs):
+    invalidate(f"posts:group:{instance.slug}")
+
+
+def invalidate_author(sender, instance, **kwargs):
+    # Logins only touch last_login, which is never rendered.
+    if kwargs.get("update_fields") != frozenset({"last_login"}):
+        invalidate(*author_tags([instance]))
+
+
+for model, receiver in (
+    (Post, invalidate_post),
+    (Comment, invalidate_comment),
+    (Follow, invalidate_follow),
+    (Group, invalidate_group),
+    (User, invalidate_author),
+):
+    post_save.connect(receiver, sender=model)
+    post_delete.connect(receiver, sender=model)
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+
+from .models import Post
+from .tiered import active_user, group_by_slug
+
+FEED_TYPES = {"atom": Atom1Feed, "rss": Rss201rev2Feed}
+
+
+class PostsFeed(Feed):
+    """
+    Feed of the latest SYNDICATION_ITEMS visible posts matching the
+    conditions in ._filter_posts, as Atom or RSS.
+    """
+
+    def __init__(self, format):
+        super().__init__()
+        self.feed_type = FEED_TYPES[format]
+
+    def _filter_posts(self, obj):
+        return {}
+
+    def items(self, obj):
+        return (
+            Post.objects.visible()
+            .filter(**self._filter_posts(obj))
+            .select_related("author", "group")
+            .order_by("-id")[: settings.SYNDICATION_ITEMS]
+        )
+
+    def item_title(self, post):
+        return Truncator(post.text).chars(80) or f"Post by @{post.author.username}"
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse("single_post", args=(post.author.username, post.id))
+
+    def item_pubdate(self, post):
+        return post.date
+
+    def item_author_name(self, post):
+        return post.author.username
+
+    def item_categories(self, post):
+        return [post.group.slug] if post.group else []
+
+
+class IndexPostsFeed(PostsFeed):
+    title = "ThePost: latest posts"
+    link = reverse_lazy("index_posts")
+    description = "Latest posts on ThePost."
+
+    def cache_tag(self):
+        return "posts:all"
+
+
+class ProfilePostsFeed(PostsFeed):
+    def get_object(self, request, username):
+        return active_user(username)
+
+    def title(self, author):
+        return f"ThePost: posts by @{author.username}"
+
+    def link(self, author):
+        return reverse("profile_posts", args=(author.username,))
+
+    def description(self, author):
+        return f"Latest posts by @{author.username} on ThePost."
+
+    def _filter_posts(self, author):
+        return {"author": author}
+
+    def cache_tag(self, username):
+        return f"posts:user:{username}"
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return group_by_slug(slug)
+
+    def title(self, group):
+        return f"ThePost: posts in {group.title}"
+
+    def link(self, group):
+        return reverse("group_posts", args=(group.slug,))
+
+    def description(self, group):
+        return group.description
+
+    def _filter_posts(self, group):
+        return {"group": group}
+
+    def cache_tag(self, slug):
+        return f"posts:group:{slug}"
@@ -0,0 +1,61 @@
+import re
+
+from django.db import transaction
+
+from .caching import invalidate
+from .models import Hashtag, Mention, User
+
+HASHTAG_RE = re.compile(r"(?<![\w#&])#(\w{1,100})")
+# Usernames may contain letters, digits and @.+-_, but not end a mention with
+# the punctuation of the sentence around it.
+MENTION_RE = re.compile(r"(?<![\w@])@(\w(?:[\w.@+-]{0,148}\w)?)")
+
+
+def parse_hashtags(text):
+    return {tag.lower() for tag in HASHTAG_RE.findall(text)}
+
+
+def parse_mentions(text):
+    return set(MENTION_RE.findall(text))
+
+
+def index_texts(posts=(), comments=()):
+    """
+    Replaces the hashtags and mentions indexed for the posts and comments,
+    with one query for all the mentioned users and one insert per table.
+    """
+    items = [(post.id, None, post.text) for post in posts] + [
+        (comment.post_id, comment.id, comment.text) for comment in comments
+    ]
+    parsed = [
+        (post_id, comment_id, parse_hashtags(text), parse_mentions(text))
+        for post_id, comment_id, text in items
+    ]
+    usernames = set().union(*(mentions for *_, mentions in parsed))
+    user_ids = dict(
+        User.objects.filter(username__in=usernames).values_list("username", "id")
+    )
+    post_ids = [post.id for post in posts]
+    # Tag feeds the posts are removed from or added to.
+    feed_tags = set(
+        Hashtag.objects.filter(post_id__in=post_ids, comment=None).values_list(
+            "tag", flat=True
+        )
+    ).union(*(tags for _, comment_id, tags, _ in parsed if comment_id is None))
+    with transaction.atomic():
+        for model in (Hashtag, Mention):
+            model.objects.filter(post_id__in=post_ids, comment=None).delete()
+            model.objects.filter(comment_id__in=[c.id for c in comments]).delete()
+        Hashtag.objects.bulk_create(
+            Hashtag(tag=tag, post_id=post_id, comment_id=comment_id)
+            for post_id, comment_id, tags, _ in parsed
+            for tag in tags
+        )
+        Mention.objects.bulk_create(
+            Mention(user_id=user_ids[username], post_id=post_id, comment_id=comment_id)
+            for post_id, comment_id, _, mentions in parsed
+            for username in mentions
+            if username in user_ids
+        )
+    # Tag feeds may have been rendered between saving and indexing the text.
+    invalidate(*(f"posts:tag:{tag}" for tag in feed_tags))
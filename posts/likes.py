@@ -0,0 +1,106 @@
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .models import Like, LikeCounter
+
+COUNT_SQL = f"""
+    INSERT INTO {LikeCounter._meta.db_table} (post_id, shard, count)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (post_id, shard) DO UPDATE SET
+        count = {LikeCounter._meta.db_table}.count + EXCLUDED.count
+"""
+
+
+def _cache_key(post_id):
+    return f"likes:{post_id}"
+
+
+def _count(post_id, delta):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            COUNT_SQL,
+            [post_id, random.randrange(settings.LIKE_COUNTER_SHARDS), delta],
+        )
+    try:
+        cache.incr(_cache_key(post_id), delta)
+    except ValueError:
+        # Not cached, the next read sums the shards.
+        pass
+
+
+def like(user, post):
+    """
+    Likes the post if the user does not already, counting the like in a
+    random shard of the post's counter.
+    """
+    with transaction.atomic():
+        _, created = Like.objects.get_or_create(user=user, post=post)
+        if created:
+            _count(post.id, 1)
+
+
+def unlike(user, post):
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            _count(post.id, -1)
+
+
+def delete_likes(like_ids):
+    """
+    Deletes the likes with the ids, taking them off their posts' counters in
+    the same transaction. Returns the number of likes deleted.
+    """
+    with transaction.atomic():
+        post_ids = list(
+            Like.objects.filter(pk__in=like_ids)
+            .select_for_update()
+            .values_list("post_id", flat=True)
+        )
+        Like.objects.filter(pk__in=like_ids).delete()
+        # Ordered by post, so that concurrent purges lock the shards alike.
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                COUNT_SQL,
+                [
+                    (post_id, random.randrange(settings.LIKE_COUNTER_SHARDS), -count)
+                    for post_id, count in sorted(Counter(post_ids).items())
+                ],
+            )
+    cache.delete_many([_cache_key(post_id) for post_id in set(post_ids)])
+    return len(post_ids)
+
+
+def like_counts(post_ids):
+    """
+    Like counts of the posts, {post id: count}, summed over their shards and
+    cached for LIKE_COUNT_CACHE_TIMEOUT seconds.
+    """
+    keys = {_cache_key(post_id): post_id for post_id in post_ids}
+    counts = {keys[key]: count for key, count in cache.get_many(keys).items()}
+    missing = [post_id for post_id in post_ids if post_id not in counts]
+    if missing:
+        summed = dict(
+            LikeCounter.objects.filter(post_id__in=missing)
+            .values("post_id")
+            .annotate(total=Sum("count"))
+            .values_list("post_id", "total")
+        )
+        for post_id in missing:
+            counts[post_id] = summed.get(post_id, 0)
+        cache.set_many(
+            {_cache_key(post_id): counts[post_id] for post_id in missing},
+            settings.LIKE_COUNT_CACHE_TIMEOUT,
+        )
+    return counts
+
+
+def attach_like_counts(posts):
+    counts = like_counts([post.id for post in posts])
+    for post in posts:
+        post.like_count = counts[post.id]
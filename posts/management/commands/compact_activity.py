@@ -0,0 +1,71 @@
+import datetime as dt
+import os
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from posts import activity
+from posts.management.pool import process_pool
+
+
+def backfill_range(since, until):
+    """
+    Recomputes the activity rows of [since, until) in a pool process.
+    """
+    try:
+        activity.backfill(since, until)
+    finally:
+        connection.close()
+    return since, until
+
+
+class Command(BaseCommand):
+    help = (
+        "Merges the activity rows appended per user, group and day since "
+        "--since, yesterday by default; run it hourly or daily. With "
+        "--backfill, recomputes the rows of [--since, --until) from the posts, "
+        "comments and follows instead, --range-days at a time in parallel."
+    )
+
+    def add_arguments(self, parser):
+        today = timezone.now().date()
+        parser.add_argument(
+            "--since",
+            type=dt.date.fromisoformat,
+            default=today - dt.timedelta(days=1),
+            help="YYYY-MM-DD, UTC.",
+        )
+        parser.add_argument(
+            "--until",
+            type=dt.date.fromisoformat,
+            default=today + dt.timedelta(days=1),
+            help="YYYY-MM-DD, UTC, exclusive.",
+        )
+        parser.add_argument("--backfill", action="store_true")
+        parser.add_argument("--range-days", type=int, default=30)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Processes backfilling date ranges, 0 to backfill in-process.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["backfill"]:
+            merged = activity.compact(options["since"], options["until"])
+            self.stderr.write(f"Compacted into {merged} rows")
+            return
+        step = dt.timedelta(days=options["range_days"])
+        ranges, since = [], options["since"]
+        while since < options["until"]:
+            ranges.append((since, min(since + step, options["until"])))
+            since += step
+        with process_pool(options["processes"]) as pool:
+            futures = [pool.submit(backfill_range, *dates) for dates in ranges]
+            for done, future in enumerate(as_completed(futures), 1):
+                since, until = future.result()
+                self.stderr.write(
+                    f"Backfilled {since} to {until}, {done}/{len(ranges)} ranges"
+                )
@@ -0,0 +1,80 @@
+import contextlib
+import gzip
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Models in dependency order: a model only references models listed before it.
+MODELS = [User, Group, Post, Comment, Follow]
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def model_columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def open_dump(path, mode):
+    """
+    Opens an NDJSON dump for reading or writing in text mode, transparently
+    (de)compressing files ending in .gz. A path of "-" means stdin/stdout.
+    """
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams users, groups, posts, comments and follows to an NDJSON dump, "
+        "one {model, row} object per line."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output", help="Path to the dump, .gz to compress, - for stdout."
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        with open_dump(options["output"], "w") as dump:
+            for model in MODELS:
+                self._export_model(model, dump, chunk_size)
+
+    def _export_model(self, model, dump, chunk_size):
+        label, columns = model_label(model), model_columns(model)
+        # .iterator() streams rows through a server-side cursor on PostgreSQL.
+        rows = (
+            model._default_manager.order_by("pk")
+            .values_list(*columns)
+            .iterator(chunk_size=chunk_size)
+        )
+        started, count = time.monotonic(), 0
+        for row in rows:
+            dump.write(
+                json.dumps(
+                    {"model": label, "row": dict(zip(columns, row))},
+                    default=str,
+                )
+                + "\n"
+            )
+            count += 1
+            if count % chunk_size == 0:
+                self._report(label, count, started)
+        self._report(label, count, started)
+
+    def _report(self, label, count, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stderr.write(f"{label}: {count} rows, {count / elapsed:.0f} rows/s")
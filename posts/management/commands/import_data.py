@@ -0,0 +1,161 @@
+import io
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .export_data import MODELS, model_columns, model_label, open_dump
+
+MODELS_BY_LABEL = {model_label(model): model for model in MODELS}
+
+SECONDARY_INDEXES_SQL = """
+    SELECT i.relname, pg_get_indexdef(i.oid)
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    JOIN pg_class t ON t.oid = x.indrelid
+    WHERE t.relname = %s AND NOT x.indisprimary AND NOT x.indisunique
+    AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.oid)
+"""
+
+
+def _csv_row(values):
+    """
+    Formats a row for COPY ... (FORMAT csv): NULL is an unquoted empty field,
+    every other value is quoted so that empty strings stay empty strings.
+    """
+    return ",".join(
+        "" if value is None else '"' + str(value).replace('"', '""') + '"'
+        for value in values
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads a dump written by export_data in batches through COPY. Rows that "
+        "already exist are skipped, so an interrupted import can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Path to the dump, .gz if compressed.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue from the checkpoint left by an interrupted import.",
+        )
+        parser.add_argument(
+            "--defer-indexes",
+            action="store_true",
+            help="Drop secondary indexes for the load and rebuild them afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("import_data requires PostgreSQL.")
+        if options["input"] == "-" and options["resume"]:
+            raise CommandError("--resume requires a dump file, not stdin.")
+        self.chunk_size = options["chunk_size"]
+        self.checkpoint_path = (
+            None if options["input"] == "-" else options["input"] + ".checkpoint"
+        )
+        self.state = {"line": 0, "indexes": []}
+        if options["resume"] and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as checkpoint:
+                self.state = json.load(checkpoint)
+            self.stderr.write(f"Resuming after line {self.state['line']}")
+        if options["defer_indexes"] and not self.state["indexes"]:
+            self.state["indexes"] = self._drop_secondary_indexes()
+            self._save_checkpoint()
+        self.counts, self.started = {}, time.monotonic()
+        with open_dump(options["input"], "r") as dump:
+            self._load(dump)
+        self._rebuild_indexes()
+        self._reset_sequences()
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _load(self, dump):
+        label, batch, last_line = None, [], self.state["line"]
+        for lineno, line in enumerate(dump, 1):
+            if lineno <= self.state["line"] or not line.strip():
+                continue
+            record = json.loads(line)
+            if batch and (record["model"] != label or len(batch) >= self.chunk_size):
+                self._flush(label, batch, last_line)
+                batch = []
+            label, last_line = record["model"], lineno
+            batch.append(record["row"])
+        if batch:
+            self._flush(label, batch, last_line)
+
+    def _flush(self, label, rows, last_line):
+        try:
+            model = MODELS_BY_LABEL[label]
+        except KeyError:
+            raise CommandError(f"Unknown model in dump: {label}")
+        table, columns = model._meta.db_table, model_columns(model)
+        staging = f"import_{table}"
+        column_list = ", ".join(connection.ops.quote_name(column) for column in columns)
+        data = io.StringIO(
+            "\n".join(_csv_row(row.get(column) for column in columns) for row in rows)
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS "{staging}" (LIKE "{table}")'
+            )
+            cursor.execute(f'TRUNCATE "{staging}"')
+            cursor.cursor.copy_expert(
+                f'COPY "{staging}" ({column_list}) FROM STDIN WITH (FORMAT csv)', data
+            )
+            cursor.execute(
+                f'INSERT INTO "{table}" ({column_list}) '
+                f'SELECT {column_list} FROM "{staging}" ON CONFLICT DO NOTHING'
+            )
+        self.state["line"] = last_line
+        self._save_checkpoint()
+        self.counts[label] = self.counts.get(label, 0) + len(rows)
+        total = sum(self.counts.values())
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stderr.write(
+            f"{label}: {self.counts[label]} rows, {total / elapsed:.0f} rows/s overall"
+        )
+
+    def _drop_secondary_indexes(self):
+        indexes = []
+        with connection.cursor() as cursor:
+            for model in MODELS:
+                cursor.execute(SECONDARY_INDEXES_SQL, [model._meta.db_table])
+                for name, definition in cursor.fetchall():
+                    cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+                    indexes.append(definition)
+        self.stderr.write(f"Dropped {len(indexes)} secondary indexes")
+        return indexes
+
+    def _rebuild_indexes(self):
+        started = time.monotonic()
+        with connection.cursor() as cursor:
+            for definition in self.state["indexes"]:
+                cursor.execute(
+                    definition.replace(
+                        "CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1
+                    )
+                )
+        if self.state["indexes"]:
+            self.stderr.write(
+                f"Rebuilt {len(self.state['indexes'])} indexes "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+
+    def _reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+                cursor.execute(sql)
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        with open(self.checkpoint_path, "w") as checkpoint:
+            json.dump(self.state, checkpoint)
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.indexing import index_texts
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills the hashtag and mention index of existing posts and "
+        "comments, --batch-size of them per transaction. Rerunning it is safe, "
+        "and --after-post/--after-comment resume an interrupted run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--after-post", type=int, default=0)
+        parser.add_argument("--after-comment", type=int, default=0)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.1,
+            help="Seconds to sleep between batches to let other writers through.",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self._backfill(Post.objects.only("id", "text"), "posts", options["after_post"])
+        self._backfill(
+            Comment.objects.only("id", "post_id", "text"),
+            "comments",
+            options["after_comment"],
+        )
+
+    def _backfill(self, queryset, label, after):
+        total = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=after).order_by("pk")[
+                    : self.options["batch_size"]
+                ]
+            )
+            if not batch:
+                break
+            index_texts(**{label: batch})
+            total, after = total + len(batch), batch[-1].pk
+            self.stderr.write(f"{label}: {total} indexed, up to id {after}")
+            time.sleep(self.options["pause"])
@@ -0,0 +1,134 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.likes import delete_likes
+from posts.models import (
+    Comment,
+    FeedMark,
+    Follow,
+    Hashtag,
+    Like,
+    LikeCounter,
+    Mention,
+    Post,
+    PostViews,
+    UserActivity,
+    UserDeletion,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Purges soft-deleted posts and users together with their comments, "
+        "replies, likes, follows, mentions and counters, deleting at most "
+        "--batch-size rows per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.1,
+            help="Seconds to sleep between batches to let other writers through.",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size, self.pause = options["batch_size"], options["pause"]
+        self._purge_posts(Post.objects.filter(is_deleted=True), "deleted posts")
+        for deletion in UserDeletion.objects.select_related("user").order_by("pk"):
+            user = deletion.user
+            label = f"user {user.username}"
+            self._delete(
+                Follow.objects.filter(Q(follower=user) | Q(followee=user)),
+                f"follows of {label}",
+            )
+            self._delete_comments(
+                Comment.objects.filter(author=user), f"comments of {label}"
+            )
+            self._delete(
+                Like.objects.filter(user=user), f"likes of {label}", delete_likes
+            )
+            for model, name in (
+                (Mention, "mentions"),
+                (FeedMark, "feed marks"),
+                (UserActivity, "activity"),
+            ):
+                self._delete(model.objects.filter(user=user), f"{name} of {label}")
+            self._purge_posts(Post.objects.filter(author=user), f"posts of {label}")
+            # Nothing large is left to cascade to.
+            user.delete()
+            self.stderr.write(f"Purged {label}")
+
+    def _purge_posts(self, posts, label):
+        """
+        Deletes the posts batch by batch, each after the rows depending on
+        it.
+        """
+        total = 0
+        while True:
+            ids = list(
+                posts.order_by("pk").values_list("pk", flat=True)[: self.batch_size]
+            )
+            if not ids:
+                break
+            self._delete_comments(
+                Comment.objects.filter(post_id__in=ids), f"comments on {label}"
+            )
+            for model, name in (
+                (Like, "likes"),
+                (LikeCounter, "like counters"),
+                (PostViews, "views"),
+                (Hashtag, "hashtags"),
+                (Mention, "mentions"),
+            ):
+                self._delete(
+                    model.objects.filter(post_id__in=ids), f"{name} of {label}"
+                )
+            total += Post.objects.filter(pk__in=ids).delete()[0]
+            self.stderr.write(f"{label}: {total} rows deleted")
+            time.sleep(self.pause)
+
+    def _delete_comments(self, comments, label):
+        """
+        Deletes the comments batch by batch, each after the replies to it,
+        whoever wrote them, and its hashtags and mentions.
+        """
+        total = 0
+        while True:
+            ids = list(
+                comments.order_by("pk").values_list("pk", flat=True)[: self.batch_size]
+            )
+            if not ids:
+                break
+            self._delete_comments(
+                Comment.objects.filter(parent_id__in=ids), f"replies to {label}"
+            )
+            for model, name in ((Hashtag, "hashtags"), (Mention, "mentions")):
+                self._delete(
+                    model.objects.filter(comment_id__in=ids), f"{name} of {label}"
+                )
+            total += Comment.objects.filter(pk__in=ids).delete()[0]
+            self.stderr.write(f"{label}: {total} rows deleted")
+            time.sleep(self.pause)
+
+    def _delete(self, queryset, label, delete=None):
+        """
+        Deletes the rows batch by batch, with `delete`, given the ids of a
+        batch and returning how many rows it deleted, if any.
+        """
+        total = 0
+        while True:
+            ids = list(
+                queryset.order_by("pk").values_list("pk", flat=True)[: self.batch_size]
+            )
+            if not ids:
+                break
+            if delete:
+                total += delete(ids)
+            else:
+                total += queryset.model.objects.filter(pk__in=ids).delete()[0]
+            self.stderr.write(f"{label}: {total} rows deleted")
+            time.sleep(self.pause)
@@ -0,0 +1,204 @@
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand
+from django.urls import NoReverseMatch, reverse
+from django.utils.crypto import get_random_string
+
+from posts.models import Comment, Group, Hashtag, Post, User
+from posts.traffic import percentile, read_log
+
+# Values that the anonymized users and URL arguments of each kind are mapped to,
+# at most POOL_SIZE of them.
+POOLS = {
+    "user": lambda: User.objects.filter(is_active=True)
+    .order_by("-pk")
+    .values_list("pk", flat=True),
+    "username": lambda: User.objects.filter(is_active=True)
+    .order_by("-pk")
+    .values_list("username", flat=True),
+    "post_id": lambda: Post.objects.visible()
+    .order_by("-id")
+    .values_list("id", flat=True),
+    "comment_id": lambda: Comment.objects.order_by("-id").values_list("id", flat=True),
+    "slug": lambda: Group.objects.order_by("-id").values_list("slug", flat=True),
+    "tag": lambda: Hashtag.objects.order_by("tag")
+    .values_list("tag", flat=True)
+    .distinct(),
+}
+POOL_SIZE = 10000
+
+# Form data posted in place of the captured one, which is not logged.
+FORMS = {
+    "new_post": {"text": "Replayed post"},
+    "new_comment": {"text": "Replayed comment"},
+    "edit_post": {"text": "Replayed post, edited"},
+    "edit_comment": {"text": "Replayed comment, edited"},
+}
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a log captured by TrafficCaptureMiddleware against a server "
+        "and reports the latency percentiles and error rate of every route. "
+        "Anonymized users and URL arguments are mapped consistently to users, "
+        "posts, comments, groups and tags of the database, so hot spots are "
+        "kept, and users are logged in with sessions created in the session "
+        "store: the server must share the database and session store. Writes "
+        "are replayed, so only replay against a test server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("log", help="Log captured in TRAFFIC_CAPTURE_FILE.")
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument(
+            "--speed",
+            type=float,
+            default=1.0,
+            help="Replay this many times faster than captured, 0 for no pauses.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Maximum number of requests in flight.",
+        )
+        parser.add_argument("--limit", type=int, help="Replay the first N requests.")
+        parser.add_argument("--timeout", type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.base_url = options["base_url"].rstrip("/")
+        self.pools, self.sessions = {}, {}
+        self.csrf_token = get_random_string(32)
+        self.opener = urllib.request.build_opener(NoRedirect)
+        entries = sorted(
+            islice(read_log(options["log"]), options["limit"]), key=lambda e: e["t"]
+        )
+        # Requests are built upfront, so that the database is only queried
+        # from this thread and does not slow the replay down.
+        requests = [(entry, self._request(entry)) for entry in entries]
+        skipped = sum(1 for _, request in requests if request is None)
+        if skipped:
+            self.stderr.write(f"Skipping {skipped} requests that cannot be replayed")
+        requests = [(e, request) for e, request in requests if request is not None]
+        self.stderr.write(f"Replaying {len(requests)} requests")
+        results = {}
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            futures, started = [], time.monotonic()
+            for entry, request in requests:
+                if options["speed"]:
+                    offset = (entry["t"] - entries[0]["t"]) / options["speed"]
+                    time.sleep(max(0, offset - (time.monotonic() - started)))
+                futures.append((entry["r"], pool.submit(self._send, request)))
+            for route, future in futures:
+                results.setdefault(route, []).append(future.result())
+        self.stderr.write(f"Done in {time.monotonic() - started:.1f}s")
+        self._report(results)
+
+    def _pool(self, kind):
+        if kind not in self.pools:
+            self.pools[kind] = list(POOLS[kind]()[:POOL_SIZE]) if kind in POOLS else []
+        return self.pools[kind]
+
+    def _substitute(self, kind, hashed):
+        pool = self._pool(kind)
+        return pool[int(hashed, 16) % len(pool)] if pool else None
+
+    def _request(self, entry):
+        """
+        Request replaying the entry, None if it cannot be built from the
+        database.
+        """
+        kwargs = {}
+        for name, value in entry["k"].items():
+            kwargs[name] = value if name == "format" else self._substitute(name, value)
+            if kwargs[name] is None:
+                return None
+        try:
+            url = self.base_url + reverse(entry["r"], kwargs=kwargs)
+        except NoReverseMatch:
+            return None
+        if entry["p"]:
+            url += f"?page={entry['p']}"
+        # Any CSRF token passes the check as long as the cookie and the header
+        # carry the same one.
+        cookies = [f"{settings.CSRF_COOKIE_NAME}={self.csrf_token}"]
+        if entry["u"]:
+            user_pk = self._substitute("user", entry["u"])
+            if user_pk is None:
+                return None
+            cookies.append(f"{settings.SESSION_COOKIE_NAME}={self._session(user_pk)}")
+        headers = {
+            "Cookie": "; ".join(cookies),
+            "X-CSRFToken": self.csrf_token,
+            "Referer": self.base_url + "/",
+        }
+        data = None
+        if entry["m"] == "POST":
+            data = urllib.parse.urlencode(FORMS.get(entry["r"], {})).encode()
+        return urllib.request.Request(url, data, headers, method=entry["m"])
+
+    def _session(self, user_pk):
+        """
+        Key of a session logging the user in, created for the replay.
+        """
+        if user_pk not in self.sessions:
+            user = User.objects.get(pk=user_pk)
+            session = import_module(settings.SESSION_ENGINE).SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.create()
+            self.sessions[user_pk] = session.session_key
+        return self.sessions[user_pk]
+
+    def _send(self, request):
+        """
+        Status and latency in seconds of the request, with a None status if
+        it failed without a response.
+        """
+        started = time.monotonic()
+        try:
+            with self.opener.open(request, timeout=self.options["timeout"]) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            status = error.code
+        except OSError:
+            status = None
+        return status, time.monotonic() - started
+
+    def _report(self, results):
+        if not results:
+            return
+        self.stdout.write(
+            f"{'route':<24} {'requests':>8} {'errors':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        total = [
+            result for route_results in results.values() for result in route_results
+        ]
+        for route, route_results in [*sorted(results.items()), ("total", total)]:
+            latencies = sorted(latency * 1000 for _, latency in route_results)
+            errors = sum(
+                1 for status, _ in route_results if not status or status >= 500
+            )
+            self.stdout.write(
+                f"{route:<24} {len(route_results):>8} "
+                f"{errors / len(route_results):>7.1%} "
+                + " ".join(f"{percentile(latencies, p):>8.1f}" for p in (50, 95, 99))
+            )
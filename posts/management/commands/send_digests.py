@@ -0,0 +1,180 @@
+import datetime as dt
+import json
+import os
+import time
+from concurrent.futures import as_completed
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.management.pool import process_pool
+from posts.models import Post
+
+User = get_user_model()
+
+# For each follower in the chunk, the `top` posts of their followees published
+# in [since, until), ranked by the number of comments.
+TOP_POSTS_SQL = """
+    SELECT follower_id, post_id FROM (
+        SELECT
+            f.follower_id,
+            p.id AS post_id,
+            ROW_NUMBER() OVER (
+                PARTITION BY f.follower_id
+                ORDER BY (
+                    SELECT COUNT(*) FROM posts_comment c WHERE c.post_id = p.id
+                ) DESC, p.date DESC
+            ) AS rank
+        FROM posts_follow f
+        JOIN posts_post p ON p.author_id = f.followee_id AND NOT p.is_deleted
+        JOIN auth_user a ON a.id = p.author_id AND a.is_active
+        WHERE f.follower_id = ANY(%s) AND p.date >= %s AND p.date < %s
+    ) ranked
+    WHERE rank <= %s
+    ORDER BY follower_id, rank
+"""
+
+
+def send_batch(messages):
+    """
+    Renders and sends a batch of digests in a pool process. Returns the ids
+    of the users the digests were sent to.
+    """
+    emails = [
+        EmailMessage(
+            subject=f"Your ThePost digest for {context['date']:%d %b %Y}",
+            body=render_to_string("emails/digest.txt", context),
+            to=[context["email"]],
+        )
+        for context in messages
+    ]
+    get_connection().send_messages(emails)
+    return [context["user_id"] for context in messages]
+
+
+class Command(BaseCommand):
+    help = (
+        "Emails every active user the top posts their followees published the day "
+        "before --date. Progress is checkpointed, so rerunning an interrupted "
+        "run for the same date does not send a digest twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=dt.date.fromisoformat,
+            default=timezone.now().date(),
+            help="Send the digest of the day before this date (UTC), YYYY-MM-DD.",
+        )
+        parser.add_argument("--top", type=int, default=5)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Processes rendering and sending emails, 0 to send in-process.",
+        )
+        parser.add_argument("--checkpoint", help="Defaults to digests-<date>.json.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        until = dt.datetime.combine(options["date"], dt.time(), tzinfo=dt.timezone.utc)
+        self.since, self.until = until - dt.timedelta(days=1), until
+        self.checkpoint_path = (
+            options["checkpoint"] or f"digests-{options['date']}.json"
+        )
+        self.state = {"last_user_id": 0, "sent": []}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as checkpoint:
+                self.state = json.load(checkpoint)
+            self.stderr.write(f"Resuming after user {self.state['last_user_id']}")
+        self.domain = Site.objects.get_current().domain
+        self.sent, self.started = 0, time.monotonic()
+        with process_pool(options["processes"]) as pool:
+            while True:
+                users = list(
+                    User.objects.filter(
+                        pk__gt=self.state["last_user_id"], is_active=True
+                    )
+                    .exclude(email="")
+                    .order_by("pk")
+                    .values("pk", "username", "email")[: options["chunk_size"]]
+                )
+                if not users:
+                    break
+                self._send_chunk(pool, users)
+                self.state = {"last_user_id": users[-1]["pk"], "sent": []}
+                self._save_checkpoint()
+        self.stderr.write(f"Done, {self.sent} digests sent")
+
+    def _send_chunk(self, pool, users):
+        already_sent = set(self.state["sent"])
+        users = [user for user in users if user["pk"] not in already_sent]
+        digests = self._digests(users)
+        size = self.options["batch_size"]
+        batches = [digests[i : i + size] for i in range(0, len(digests), size)]
+        for future in as_completed([pool.submit(send_batch, b) for b in batches]):
+            sent_to = future.result()
+            self.state["sent"].extend(sent_to)
+            self.sent += len(sent_to)
+            self._save_checkpoint()
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stderr.write(
+            f"Up to user {users[-1]['pk'] if users else '-'}: "
+            f"{self.sent} digests sent, {self.sent / elapsed:.1f}/s"
+        )
+
+    def _digests(self, users):
+        """
+        Builds the email contexts for a chunk of users with two queries:
+        one ranking the posts of every user's followees, one loading them.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                TOP_POSTS_SQL,
+                [
+                    [user["pk"] for user in users],
+                    self.since,
+                    self.until,
+                    self.options["top"],
+                ],
+            )
+            ranked = cursor.fetchall()
+        posts = Post.objects.select_related("author", "group").in_bulk(
+            {post_id for _, post_id in ranked}
+        )
+        top_posts = {}
+        for user_id, post_id in ranked:
+            top_posts.setdefault(user_id, []).append(self._post_context(posts[post_id]))
+        return [
+            {
+                "user_id": user["pk"],
+                "username": user["username"],
+                "email": user["email"],
+                "date": self.since,
+                "posts": top_posts[user["pk"]],
+            }
+            for user in users
+            if user["pk"] in top_posts
+        ]
+
+    def _post_context(self, post):
+        return {
+            "author": post.author.username,
+            "group": post.group.title if post.group else None,
+            "text": post.text,
+            "url": "http://"
+            + self.domain
+            + reverse("single_post", args=(post.author.username, post.id)),
+        }
+
+    def _save_checkpoint(self):
+        with open(self.checkpoint_path, "w") as checkpoint:
+            json.dump(self.state, checkpoint)
@@ -0,0 +1,146 @@
+import datetime as dt
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from posts.management.pool import process_pool
+from posts.models import GroupActivity, User
+
+
+def warm_page(kind, path, host):
+    """
+    Renders the page at the path as an anonymous visitor gets it, in a pool
+    process, which caches the page with the fragments and counters it is
+    rendered from and loads the rows it reads into Postgres' buffers.
+    Returns the kind of page, its status code and how long it took.
+    """
+    started = time.monotonic()
+    try:
+        request = RequestFactory().get(path, HTTP_HOST=host)
+        request.user = AnonymousUser()
+        match = resolve(request.path_info)
+        try:
+            response = match.func(request, *match.args, **match.kwargs)
+        except Http404:
+            # Such as index pages past the last one.
+            return kind, 404, time.monotonic() - started
+        if hasattr(response, "render"):
+            response.render()
+        return kind, response.status_code, time.monotonic() - started
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Warms the cache after a deploy or a cache flush by rendering the "
+        "hottest pages: the first --index-pages pages of the index, the "
+        "profiles of the --profiles most followed users and the pages of the "
+        "--groups busiest groups over the last ACTIVITY_DAYS days, interleaved "
+        "and hottest first, with up to --processes pages rendered at a time. "
+        "Stops starting new pages once --budget seconds have passed. Pool "
+        "processes only warm a cache shared between processes, not LocMemCache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--index-pages", type=int, default=5)
+        parser.add_argument("--profiles", type=int, default=100)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Processes rendering pages, 0 to render in-process.",
+        )
+        parser.add_argument(
+            "--budget", type=float, default=60.0, help="Time budget in seconds."
+        )
+        parser.add_argument("--host", help="Host of the pages, the site's domain.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        started = time.monotonic()
+        deadline = started + options["budget"]
+        host = options["host"] or Site.objects.get_current().domain
+        targets = self._targets()
+        self.stderr.write(f"Warming up to {len(targets)} pages")
+        totals, failed, pending = {}, 0, set()
+        with process_pool(options["processes"]) as pool:
+            while targets or pending:
+                while (
+                    targets
+                    and len(pending) < max(options["processes"], 1)
+                    and time.monotonic() < deadline
+                ):
+                    pending.add(pool.submit(warm_page, *targets.pop(0), host))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        kind, status, seconds = future.result()
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f"Failed to warm a page: {error!r}")
+                        continue
+                    if status >= 400:
+                        failed += status != 404
+                        continue
+                    count, total = totals.get(kind, (0, 0.0))
+                    totals[kind] = (count + 1, total + seconds)
+        for kind, (count, total) in totals.items():
+            self.stderr.write(
+                f"{kind}: {count} pages, {total / count * 1000:.0f} ms on average"
+            )
+        self.stderr.write(
+            f"Warmed {sum(count for count, _ in totals.values())} pages "
+            f"({failed} failed) in {time.monotonic() - started:.1f}s"
+            + (f", {len(targets)} left over budget" if targets else "")
+        )
+
+    def _targets(self):
+        """
+        (kind, path) of the pages to warm, hottest first.
+        """
+        options = self.options
+        index = [
+            ("index", reverse("index_posts") + (f"?page={page}" if page > 1 else ""))
+            for page in range(1, options["index_pages"] + 1)
+        ]
+        usernames = (
+            User.objects.filter(is_active=True)
+            .annotate(follower_count=Count("followers"))
+            .order_by("-follower_count", "pk")
+            .values_list("username", flat=True)[: options["profiles"]]
+        )
+        since = timezone.now().date() - dt.timedelta(days=settings.ACTIVITY_DAYS)
+        slugs = (
+            GroupActivity.objects.filter(date__gte=since)
+            .values("group__slug")
+            .annotate(total=Sum("posts") + Sum("comments"))
+            .order_by("-total")
+            .values_list("group__slug", flat=True)[: options["groups"]]
+        )
+        profiles = [
+            ("profile", reverse("profile_posts", args=(username,)))
+            for username in usernames
+        ]
+        groups = [("group", reverse("group_posts", args=(slug,))) for slug in slugs]
+        # Interleaved, so that a short budget still warms some of each.
+        targets = []
+        for i in range(max(len(index), len(profiles), len(groups))):
+            targets.extend(
+                pages[i] for pages in (index, groups, profiles) if i < len(pages)
+            )
+        return targets
@@ -0,0 +1,20 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+
+
+def process_pool(processes):
+    """
+    Executor for management commands to spread work over `processes` pool
+    processes, or to run it in-process, one task at a time, if 0.
+    """
+    if not processes:
+        return ThreadPoolExecutor(max_workers=1)
+    # Spawned rather than forked, so that pool processes do not inherit
+    # the parent's database connections.
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
@@ -0,0 +1,145 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .profiler import RequestProfile, should_profile
+from .throttling import is_write_view
+from .traffic import record, should_capture, traffic_log
+
+
+class ClosingStream:
+    """
+    Streamed content that calls `on_close` when the server closes the
+    response, once the last chunk is sent or the client went away.
+    """
+
+    def __init__(self, content, on_close):
+        self.content, self.on_close = content, on_close
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.content)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+
+
+def queue_time_of(request):
+    """
+    Seconds since the proxy received the request, per its X-Request-Start
+    header, None without one.
+    """
+    value = request.META.get("HTTP_X_REQUEST_START", "")
+    try:
+        started = float(value[2:] if value.startswith("t=") else value)
+    except ValueError:
+        return None
+    # Seconds, milliseconds or microseconds since the epoch.
+    while started > 1e11:
+        started /= 1000
+    return max(time.time() - started, 0.0)
+
+
+def after_response(response, callback):
+    """
+    Calls `callback` now, or once a streamed response is sent, so that the
+    time spent streaming the body is accounted for with the request.
+    """
+    if response.streaming:
+        response.streaming_content = ClosingStream(response.streaming_content, callback)
+    else:
+        callback()
+
+
+class LoadSheddingMiddleware(MiddlewareMixin):
+    """
+    Rejects writes with 503 and Retry-After while the site is overloaded,
+    that is while requests wait more than SHED_MAX_QUEUE_TIME seconds for a
+    worker or the worker's moving average of query latency exceeds
+    SHED_MAX_DB_LATENCY seconds. Reads are never shed, so feeds keep being
+    served during a spike. Queue time is measured from the X-Request-Start
+    header set by the proxy, as t=<seconds>, or in milliseconds or
+    microseconds since the epoch; requests without it are never shed for it.
+    Query latency is tracked per worker process.
+    """
+
+    lock = threading.Lock()
+    db_latency = 0.0
+
+    def process_request(self, request):
+        if self._time_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self._time_query)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_write_view(request, view_func) and self._overloaded(request):
+            response = HttpResponse("Service temporarily overloaded", status=503)
+            response["Retry-After"] = settings.SHED_RETRY_AFTER
+            return response
+
+    def _overloaded(self, request):
+        queue_time = queue_time_of(request)
+        return (
+            queue_time is not None and queue_time > settings.SHED_MAX_QUEUE_TIME
+        ) or self.db_latency > settings.SHED_MAX_DB_LATENCY
+
+    @classmethod
+    def _time_query(cls, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.monotonic() - started
+            with cls.lock:
+                cls.db_latency += 0.1 * (elapsed - cls.db_latency)
+
+
+class ProfilerMiddleware(MiddlewareMixin):
+    """
+    Profiles requests of the staff user that carry their token from the
+    staff profiles page, as ?profile= or in the X-Profile header, and one in
+    PROFILER_SAMPLE_RATE other requests if set, saving the profiles to
+    PROFILER_DIR. Streamed responses are profiled until their body is sent.
+    Comes after AuthenticationMiddleware, which is not profiled.
+    """
+
+    def process_request(self, request):
+        if should_profile(request):
+            request._profile = RequestProfile(request)
+            request._profile.start()
+
+    def process_response(self, request, response):
+        profile = getattr(request, "_profile", None)
+        if profile:
+            response["X-Profile-Name"] = profile.name
+            after_response(response, lambda: self._save(profile, response))
+        return response
+
+    def _save(self, profile, response):
+        profile.stop()
+        profile.save(response)
+
+
+class TrafficCaptureMiddleware(MiddlewareMixin):
+    """
+    Logs the shape of one in TRAFFIC_CAPTURE_RATE requests to the routes of
+    posts/urls.py, with users and URL arguments anonymized, for replay_traffic
+    to replay. Streamed responses are timed until their first byte.
+    """
+
+    def process_request(self, request):
+        if should_capture():
+            request._capture_started = time.time()
+
+    def process_response(self, request, response):
+        started = getattr(request, "_capture_started", None)
+        if started is not None:
+            entry = record(request, response, started)
+            if entry:
+                traffic_log.append(entry)
+        return response
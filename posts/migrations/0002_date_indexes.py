@@ -0,0 +1,27 @@
+# Generated by Django 3.1.14 on 2026-10-19 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="comment",
+            name="date",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, verbose_name="date published"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="date",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, verbose_name="date published"
+            ),
+        ),
+    ]
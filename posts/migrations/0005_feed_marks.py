@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-19 05:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("posts", "0004_hashtags_mentions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedMark",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("feed", models.CharField(max_length=60)),
+                ("last_seen_id", models.IntegerField()),
+                ("date", models.DateTimeField(auto_now=True, verbose_name="date seen")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_marks",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="feedmark",
+            constraint=models.UniqueConstraint(
+                fields=("user", "feed"), name="unique_feed_mark"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1.14 on 2026-10-19 05:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0005_feed_marks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostViews",
+            fields=[
+                (
+                    "post",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="views",
+                        serialize=False,
+                        to="posts.post",
+                    ),
+                ),
+                ("views", models.PositiveBigIntegerField(default=0)),
+                ("viewers_sketch", models.BinaryField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 3.1.14 on 2026-10-19 05:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("posts", "0007_likes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="follow",
+            name="date",
+            field=models.DateTimeField(
+                auto_now_add=True, null=True, verbose_name="date followed"
+            ),
+        ),
+        migrations.CreateModel(
+            name="UserActivity",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("posts", models.IntegerField(default=0)),
+                ("comments", models.IntegerField(default=0)),
+                ("followers", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activity",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="GroupActivity",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("posts", models.IntegerField(default=0)),
+                ("comments", models.IntegerField(default=0)),
+                (
+                    "group",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activity",
+                        to="posts.group",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="useractivity",
+            index=models.Index(
+                fields=["user", "date"], name="posts_usera_user_id_cd4f06_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="groupactivity",
+            index=models.Index(
+                fields=["group", "date"], name="posts_group_group_i_de8501_idx"
+            ),
+        ),
+    ]
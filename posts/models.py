@@ -1,26 +1,76 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def visible(self):
+        """
+        Posts that are not deleted and whose author is active, that is not
+        deleted or deactivated.
+        """
+        return self.filter(is_deleted=False, author__is_active=True)
+
+
 class Post(models.Model):
     text = models.TextField()
-    date = models.DateTimeField("date published", auto_now_add=True)
+    date = models.DateTimeField("date published", auto_now_add=True, db_index=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     group = models.ForeignKey(
         "Group", on_delete=models.SET_NULL, null=True, blank=True, related_name="posts"
     )
+    # Deleted posts are hidden at once and purged with their comments later.
+    is_deleted = models.BooleanField(default=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return f"Post by {self.author}, {self.date}"
 
 
 class Comment(models.Model):
+    # Ids in comment paths are zero-padded to PATH_STEP digits, and replies are
+    # nested at most MAX_DEPTH levels deep, deeper ones going to the last level.
+    PATH_STEP, MAX_DEPTH = 10, 25
+
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        related_name="replies",
+        blank=True,
+        null=True,
+    )
+    # Materialized path: the ids of the comment's ancestors followed by its own,
+    # so that ordering by path lists a thread depth first.
+    path = models.CharField(max_length=PATH_STEP * MAX_DEPTH, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     text = models.TextField()
-    date = models.DateTimeField("date published", auto_now_add=True)
+    date = models.DateTimeField("date published", auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "path"]),
+            models.Index(fields=["parent", "path"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.parent and self.parent.depth + 1 >= self.MAX_DEPTH:
+            self.parent = self.parent.parent
+        # Inserted with its path, or not at all: threads never list a comment
+        # without one.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.path:
+                # The path ends with the id, which is only known once inserted.
+                self.depth = self.parent.depth + 1 if self.parent else 0
+                prefix = self.parent.path if self.parent else ""
+                self.path = prefix + str(self.pk).zfill(self.PATH_STEP)
+                Comment.objects.filter(pk=self.pk).update(
+                    path=self.path, depth=self.depth
+                )
 
     def __str__(self):
         return f"Comment by {self.author} on {self.post}, {self.date}"
@@ -42,6 +92,180 @@ class Follow(models.Model):
     follower = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="followees"
     )
+    # Unknown for follows made before it was recorded.
+    date = models.DateTimeField("date followed", auto_now_add=True, null=True)
 
     def __str__(self):
         return f"Follow: {self.follower} following {self.followee}"
+
+
+class UserDeletion(models.Model):
+    """
+    A deleted user, deactivated at once and purged together with their posts,
+    comments and follows later by the purge_deleted command.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="deletion")
+    date = models.DateTimeField("date deleted", auto_now_add=True)
+
+    def __str__(self):
+        return f"Deletion of {self.user}, {self.date}"
+
+
+class UserActivity(models.Model):
+    """
+    Posts and comments a user published and followers they gained on a day.
+    Every event appends a row, and compact_activity merges the rows of each
+    user and day, so reads sum the rows of a date range.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="activity")
+    date = models.DateField()
+    posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    followers = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "date"])]
+
+    def __str__(self):
+        return f"Activity of {self.user} on {self.date}"
+
+
+class GroupActivity(models.Model):
+    """
+    Posts published in a group and comments on them on a day, maintained
+    like UserActivity.
+    """
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="activity")
+    date = models.DateField()
+    posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["group", "date"])]
+
+    def __str__(self):
+        return f"Activity in {self.group} on {self.date}"
+
+
+class PostViews(models.Model):
+    """
+    Views of a post, added up in the workers and flushed in batches by
+    posts.viewcounts, with an optional HyperLogLog sketch of its viewers.
+    """
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="views"
+    )
+    views = models.PositiveBigIntegerField(default=0)
+    viewers_sketch = models.BinaryField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.views} views of {self.post}"
+
+
+class Like(models.Model):
+    """
+    A user's like of a post, counted in the post's LikeCounter shards.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="likes")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="likes")
+    date = models.DateTimeField("date liked", auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_like")
+        ]
+
+    def __str__(self):
+        return f"{self.user} likes {self.post}"
+
+
+class LikeCounter(models.Model):
+    """
+    One of LIKE_COUNTER_SHARDS partial like counts of a post, which likes
+    are spread over so that no single row is updated by every like.
+    """
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="like_counters"
+    )
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "shard"], name="unique_like_counter_shard"
+            )
+        ]
+
+    def __str__(self):
+        return f"Likes of {self.post}, shard {self.shard}: {self.count}"
+
+
+class FeedMark(models.Model):
+    """
+    The newest post the user has seen in a feed, "subscriptions" or
+    "group:<slug>", from which unread posts are counted.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="feed_marks")
+    feed = models.CharField(max_length=60)
+    last_seen_id = models.IntegerField()
+    date = models.DateTimeField("date seen", auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "feed"], name="unique_feed_mark")
+        ]
+
+    def __str__(self):
+        return f"{self.user} saw {self.feed} up to post {self.last_seen_id}"
+
+
+class Hashtag(models.Model):
+    """
+    A #tag used in a post, or in a comment on it, extracted when saved.
+    """
+
+    tag = models.CharField(max_length=100)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="hashtags")
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="hashtags",
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["tag", "-post"])]
+
+    def __str__(self):
+        return f"#{self.tag} in {self.post}"
+
+
+class Mention(models.Model):
+    """
+    A mention of a @user in a post, or in a comment on it, extracted when saved.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="mentions")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="mentions")
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="mentions",
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-post"])]
+
+    def __str__(self):
+        return f"Mention of {self.user} in {self.post}"
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Max
+from django.db.models.signals import post_save
+
+from .indexing import parse_hashtags, parse_mentions
+from .models import Post
+
+# Posts read by the poller per query.
+POLL_BATCH_SIZE = 1000
+
+
+def post_topics(author_id, group_id, text):
+    """
+    Topics of a new post, one for every kind of feed it belongs to. Feeds
+    wait on the topics of the posts they show.
+    """
+    topics = {"all", f"author:{author_id}"}
+    if group_id:
+        topics.add(f"group:{group_id}")
+    topics.update(f"tag:{tag}" for tag in parse_hashtags(text))
+    topics.update(f"mention:{username}" for username in parse_mentions(text))
+    return topics
+
+
+class PostNotifier:
+    """
+    Per-process notifier of new posts that long-polling requests wait on,
+    keyed by the topics of the feeds they are waiting for. Posts saved in
+    this process are announced on commit; posts saved by other processes are
+    picked up by a single background thread that reads the posts newer than
+    the last one it saw every NEW_POSTS_POLL_INTERVAL seconds, so waiting
+    requests never query the database themselves.
+
+    Only posts newer than `seeded_id`, the newest post when the notifier
+    started, are announced.
+    """
+
+    def __init__(self):
+        self.seeded_id = None
+        self.latest_ids = {}
+        self.lock = threading.Lock()
+        self.waiters = {}
+        self.poller = None
+
+    def start(self):
+        """
+        Seeds the notifier with the newest post id and starts the poller, if
+        not done yet. Must be called before waiting, outside the event loop.
+        """
+        if self.seeded_id is not None:
+            return
+        seeded_id = Post.objects.aggregate(Max("id"))["id__max"] or 0
+        with self.lock:
+            if self.seeded_id is not None:
+                return
+            self.seeded_id = seeded_id
+            if settings.NEW_POSTS_POLL_INTERVAL:
+                self.poller = threading.Thread(target=self._poll, daemon=True)
+                self.poller.start()
+
+    def announce(self, post_id, topics):
+        """
+        Records `post_id` as the newest post of its topics and wakes the
+        requests waiting on any of them.
+        """
+        woken = set()
+        with self.lock:
+            for topic in topics:
+                if post_id > self.latest_ids.get(topic, 0):
+                    self.latest_ids[topic] = post_id
+                    woken.update(self.waiters.pop(topic, ()))
+        for loop, event in woken:
+            loop.call_soon_threadsafe(event.set)
+
+    def latest_id(self, topics):
+        with self.lock:
+            return max((self.latest_ids.get(topic, 0) for topic in topics), default=0)
+
+    async def wait_newer(self, topics, after, timeout):
+        """
+        Waits up to `timeout` seconds for a post of the topics newer than
+        `after` and returns the newest post id of the topics, which is not
+        greater than `after` on timeout.
+        """
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self.lock:
+            latest_id = max((self.latest_ids.get(t, 0) for t in topics), default=0)
+            if latest_id > after:
+                return latest_id
+            for topic in topics:
+                self.waiters.setdefault(topic, set()).add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.lock:
+                for topic in topics:
+                    waiters = self.waiters.get(topic)
+                    if waiters is not None:
+                        waiters.discard(waiter)
+                        if not waiters:
+                            del self.waiters[topic]
+        return self.latest_id(topics)
+
+    def _poll(self):
+        polled_id = self.seeded_id
+        while True:
+            close_old_connections()
+            try:
+                posts = list(
+                    Post.objects.filter(id__gt=polled_id)
+                    .order_by("id")
+                    .values_list("id", "author_id", "group_id", "text")[
+                        :POLL_BATCH_SIZE
+                    ]
+                )
+            except DatabaseError:
+                posts = []
+            for post_id, author_id, group_id, text in posts:
+                self.announce(post_id, post_topics(author_id, group_id, text))
+                polled_id = post_id
+            if len(posts) < POLL_BATCH_SIZE:
+                time.sleep(settings.NEW_POSTS_POLL_INTERVAL)
+
+
+notifier = PostNotifier()
+
+
+def announce_post(sender, instance, created, **kwargs):
+    if created:
+        topics = post_topics(instance.author_id, instance.group_id, instance.text)
+        transaction.on_commit(lambda: notifier.announce(instance.id, topics))
+
+
+post_save.connect(announce_post, sender=Post)
@@ -0,0 +1,214 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.http import Http404
+from django.template.base import Template
+from django.utils import timezone
+
+TOKEN_SALT = "posts.profiler"
+
+_active = threading.local()
+
+
+_timer_lock = threading.Lock()
+_timer_users = 0
+_untimed_render = None
+
+
+def make_token(user):
+    """
+    Token that makes the request it is passed with, as ?profile= or in the
+    X-Profile header, by the same staff user be profiled for
+    PROFILER_TOKEN_MAX_AGE seconds.
+    """
+    return signing.dumps(user.username, salt=TOKEN_SALT)
+
+
+def should_profile(request):
+    token = request.GET.get("profile") or request.META.get("HTTP_X_PROFILE")
+    if token and request.user.is_staff:
+        try:
+            username = signing.loads(
+                token, salt=TOKEN_SALT, max_age=settings.PROFILER_TOKEN_MAX_AGE
+            )
+        except signing.BadSignature:
+            username = None
+        if username == request.user.username:
+            return True
+    rate = settings.PROFILER_SAMPLE_RATE
+    return bool(rate) and random.randrange(rate) == 0
+
+
+def list_profiles(limit=100):
+    """
+    Summaries of the latest saved profiles, newest first.
+    """
+    if not os.path.isdir(settings.PROFILER_DIR):
+        return []
+    names = sorted(
+        (name for name in os.listdir(settings.PROFILER_DIR) if name.endswith(".json")),
+        reverse=True,
+    )[:limit]
+    profiles = []
+    for name in names:
+        with open(os.path.join(settings.PROFILER_DIR, name)) as file:
+            profile = json.load(file)
+        profile["name"] = name[: -len(".json")]
+        del profile["sql"], profile["templates"], profile["call_tree"]
+        profiles.append(profile)
+    return profiles
+
+
+def profile_path(filename):
+    """
+    Path of a saved profile file, raising Http404 for anything that is not
+    a file in PROFILER_DIR.
+    """
+    if os.path.basename(filename) != filename:
+        raise Http404
+    path = os.path.join(settings.PROFILER_DIR, filename)
+    if not os.path.isfile(path):
+        raise Http404
+    return path
+
+
+class RequestProfile:
+    """
+    Call tree, SQL queries and template renders of a single request.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.profiler = cProfile.Profile()
+        self.queries, self.templates, self.depth = [], [], 0
+        self.started = timezone.now()
+        self.name = f"{self.started:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    def start(self):
+        _install_timer()
+        _active.profile = self
+        connection.execute_wrappers.append(self._time_query)
+        self.started_monotonic = time.monotonic()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.monotonic() - self.started_monotonic
+        connection.execute_wrappers.remove(self._time_query)
+        _active.profile = None
+        _uninstall_timer()
+
+    def save(self, response):
+        """
+        Writes <name>.json with the summary, queries, templates and the call
+        tree as text, and <name>.prof with the raw cProfile stats.
+        """
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+        name = self.name
+        call_tree = io.StringIO()
+        pstats.Stats(self.profiler, stream=call_tree).sort_stats(
+            "cumulative"
+        ).print_stats(100)
+        record = {
+            "path": self.request.get_full_path(),
+            "method": self.request.method,
+            "status": response.status_code,
+            "started": self.started.isoformat(),
+            "duration": self.duration,
+            "sql_count": len(self.queries),
+            "sql_duration": sum(query["duration"] for query in self.queries),
+            "sql": self.queries,
+            "templates": self.templates,
+            "call_tree": call_tree.getvalue(),
+        }
+        with open(os.path.join(settings.PROFILER_DIR, name + ".json"), "w") as file:
+            json.dump(record, file, indent=1)
+        self.profiler.dump_stats(os.path.join(settings.PROFILER_DIR, name + ".prof"))
+        prune_profiles()
+        return name
+
+    def _time_query(self, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {"sql": sql, "many": many, "duration": time.monotonic() - started}
+            )
+
+    def time_template(self, template, render, context):
+        record = {"name": template.origin.template_name, "depth": self.depth}
+        self.templates.append(record)
+        started = time.monotonic()
+        self.depth += 1
+        try:
+            return render(template, context)
+        finally:
+            self.depth -= 1
+            record["duration"] = time.monotonic() - started
+
+
+def prune_profiles():
+    """
+    Removes the oldest profiles beyond PROFILER_MAX_PROFILES, or while the
+    files in PROFILER_DIR take more than PROFILER_MAX_BYTES.
+    """
+    sizes = {}
+    for entry in os.scandir(settings.PROFILER_DIR):
+        name, extension = os.path.splitext(entry.name)
+        if extension in (".json", ".prof") and entry.is_file():
+            sizes[name] = sizes.get(name, 0) + entry.stat().st_size
+    # Names start with the time profiling started.
+    names = sorted(sizes)
+    total = sum(sizes.values())
+    while names and (
+        len(names) > settings.PROFILER_MAX_PROFILES
+        or total > settings.PROFILER_MAX_BYTES
+    ):
+        name = names.pop(0)
+        for extension in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(settings.PROFILER_DIR, name + extension))
+            except FileNotFoundError:
+                # Removed by another worker.
+                pass
+        total -= sizes[name]
+
+
+def _install_timer():
+    """
+    Times every template render, including extended and included ones, in
+    the threads with an active profile, while any profile is active.
+    """
+    global _timer_users, _untimed_render
+    with _timer_lock:
+        _timer_users += 1
+        if _timer_users > 1:
+            return
+        render = _untimed_render = Template._render
+
+        def timed_render(template, context):
+            profile = getattr(_active, "profile", None)
+            if profile is None:
+                return render(template, context)
+            return profile.time_template(template, render, context)
+
+        Template._render = timed_render
+
+
+def _uninstall_timer():
+    global _timer_users, _untimed_render
+    with _timer_lock:
+        _timer_users -= 1
+        if not _timer_users:
+            Template._render, _untimed_render = _untimed_render, None
@@ -0,0 +1,37 @@
+import gzip
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that writes a .gz and a .br variant next to every hashed
+    text asset, for nginx's gzip_static and brotli_static.
+    """
+
+    compressible_extensions = (".css", ".js", ".map", ".svg", ".txt", ".ico", ".ttf")
+    min_size = 256
+
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+        if not kwargs.get("dry_run"):
+            for name in set(self.hashed_files.values()):
+                if name.endswith(self.compressible_extensions):
+                    self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < self.min_size:
+            return
+        variants = {
+            ".gz": gzip.compress(content, compresslevel=9, mtime=0),
+            ".br": brotli.compress(content, quality=11),
+        }
+        for extension, data in variants.items():
+            if len(data) < len(content):
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self._save(name + extension, ContentFile(data))
@@ -0,0 +1,53 @@
+from django import template
+
+from posts.caching import get_or_compute
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, timeout, name, vary_on, tags):
+        self.nodelist, self.timeout = nodelist, timeout
+        self.name, self.vary_on, self.tags = name, vary_on, tags
+
+    def render(self, context):
+        key = ":".join(
+            ["fragment", self.name]
+            + [str(var.resolve(context)) for var in self.vary_on]
+        )
+        return get_or_compute(
+            key,
+            lambda: self.nodelist.render(context),
+            self.timeout.resolve(context),
+            tags=[str(tag.resolve(context)) for tag in self.tags],
+        )
+
+
+@register.tag
+def cached_fragment(parser, token):
+    """
+    {% cached_fragment <timeout> <name> [vary on...] [tags <tag>...] %}
+    ...
+    {% endcached_fragment %}
+    Like {% cache %}, but rendered by a single worker at a time, with stale
+    content served meanwhile and invalidated with the cache tags, see
+    posts.caching.get_or_compute.
+    """
+    bits = token.split_contents()
+    tags = []
+    if "tags" in bits[3:]:
+        index = bits.index("tags", 3)
+        bits, tags = bits[:index], bits[index + 1 :]
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 2 arguments."
+        )
+    nodelist = parser.parse(("endcached_fragment",))
+    parser.delete_first_token()
+    return CachedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]],
+        [parser.compile_filter(bit) for bit in tags],
+    )
@@ -1,5 +1,9 @@
 from django import template
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
 
+from posts.indexing import HASHTAG_RE, MENTION_RE
 from posts.models import Comment, Follow, Post
 
 register = template.Library()
@@ -20,19 +24,74 @@ def is_followed(author, user):
 
 @register.filter
 def posts_count(author):
-    return len(Post.objects.filter(author=author))
+    return Post.objects.visible().filter(author=author).count()
 
 
 @register.filter
 def comment_count(post):
-    return Comment.objects.filter(post=post).count()
+    return Comment.objects.filter(post=post, author__is_active=True).count()
 
 
 @register.filter
 def follower_count(author):
-    return Follow.objects.filter(followee=author).count()
+    return Follow.objects.filter(followee=author, follower__is_active=True).count()
 
 
 @register.filter
 def followee_count(author):
-    return Follow.objects.filter(follower=author).count()
+    return Follow.objects.filter(follower=author, followee__is_active=True).count()
+
+
+@register.filter
+def newest_post_id(posts):
+    return max((post.id for post in posts), default=0)
+
+
+@register.filter
+def activity_chart(days):
+    """
+    Bars of each daily counter in the output of posts.activity, with their
+    heights in percent of the counter's busiest day.
+    """
+    charts = []
+    for counter in [key for key in days[0] if key != "date"] if days else []:
+        peak = max(day[counter] for day in days) or 1
+        charts.append(
+            {
+                "name": counter,
+                "total": sum(day[counter] for day in days),
+                "bars": [
+                    {
+                        "date": day["date"],
+                        "value": day[counter],
+                        "percent": round(100 * day[counter] / peak),
+                    }
+                    for day in days
+                ],
+            }
+        )
+    return charts
+
+
+@register.filter
+def link_tags(text):
+    """
+    Escapes the text and links its #tags and @mentions to their feeds.
+    """
+    text = HASHTAG_RE.sub(
+        lambda match: format_html(
+            '<a href="{}">#{}</a>',
+            reverse("tag_posts", args=(match[1].lower(),)),
+            match[1],
+        ),
+        escape(text),
+    )
+    text = MENTION_RE.sub(
+        lambda match: format_html(
+            '<a href="{}">@{}</a>',
+            reverse("profile_posts", args=(match[1],)),
+            match[1],
+        ),
+        text,
+    )
+    return mark_safe(text)
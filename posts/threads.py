@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db import connection
+
+from .models import Comment, User
+
+# Ids and reply counts of up to `limit` comments replying to the parent after
+# the path `after`, each with its first `replies` replies, recursively down to
+# `max_depth`. Comments by inactive users are left out with their replies.
+THREAD_SQL = f"""
+    WITH RECURSIVE thread AS (
+        (
+            SELECT c.id, c.depth FROM {Comment._meta.db_table} c
+            JOIN {User._meta.db_table} a ON a.id = c.author_id AND a.is_active
+            WHERE c.post_id = %(post)s AND {{parent}} AND c.path > %(after)s
+            ORDER BY c.path
+            LIMIT %(limit)s
+        )
+        UNION ALL
+        SELECT r.id, r.depth FROM thread t CROSS JOIN LATERAL (
+            SELECT c.id, c.depth FROM {Comment._meta.db_table} c
+            JOIN {User._meta.db_table} a ON a.id = c.author_id AND a.is_active
+            WHERE c.parent_id = t.id
+            ORDER BY c.path
+            LIMIT %(replies)s
+        ) r
+        WHERE t.depth < %(max_depth)s
+    )
+    SELECT t.id, (
+        SELECT COUNT(*) FROM {Comment._meta.db_table} c
+        JOIN {User._meta.db_table} a ON a.id = c.author_id AND a.is_active
+        WHERE c.parent_id = t.id
+    )
+    FROM thread t
+"""
+
+
+def load_thread(post, parent=None, after="", limit=None):
+    """
+    Window of up to `limit` (COMMENT_PAGE_SIZE) comments on the post replying
+    to `parent`, or top-level ones, after the path `after`, from two ordered
+    queries. Every comment comes with its first COMMENT_REPLIES_SHOWN replies,
+    down to COMMENT_THREAD_DEPTH levels below the window, as .thread_replies.
+    Replies left out are counted in .more_replies and can be loaded after
+    .replies_after. Returns the comments and the path to load the next window
+    after, None if there is none.
+    """
+    limit = limit or settings.COMMENT_PAGE_SIZE
+    depth = parent.depth + 1 if parent else 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            THREAD_SQL.format(
+                parent="c.parent_id = %(parent)s" if parent else "c.parent_id IS NULL"
+            ),
+            {
+                "post": post.id,
+                "parent": parent.id if parent else None,
+                "after": after,
+                "limit": limit,
+                "replies": settings.COMMENT_REPLIES_SHOWN,
+                "max_depth": depth + settings.COMMENT_THREAD_DEPTH,
+            },
+        )
+        reply_counts = dict(cursor.fetchall())
+    comments, loaded = [], {}
+    # Ordered by path, every comment comes after its parent.
+    for comment in (
+        Comment.objects.filter(id__in=list(reply_counts))
+        .select_related("author")
+        .order_by("path")
+    ):
+        comment.thread_replies, comment.replies_after = [], ""
+        comment.more_replies = reply_counts[comment.id]
+        loaded[comment.id] = comment
+        if comment.depth == depth:
+            comments.append(comment)
+        else:
+            replied = loaded[comment.parent_id]
+            replied.thread_replies.append(comment)
+            replied.more_replies -= 1
+            replied.replies_after = comment.path
+    return comments, comments[-1].path if len(comments) == limit else None
+
+
+def iter_thread(post):
+    """
+    All top-level comments on the post with their first replies, loaded
+    STREAM_CHUNK_SIZE top-level comments at a time.
+    """
+    after = ""
+    while after is not None:
+        comments, after = load_thread(
+            post, after=after, limit=settings.STREAM_CHUNK_SIZE
+        )
+        yield from comments
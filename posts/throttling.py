@@ -0,0 +1,96 @@
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+
+def client_ip(request):
+    """
+    Returns the client's address. nginx appends the peer address to
+    X-Forwarded-For, so the last entry is the one that can be trusted.
+    """
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    return forwarded.split(",")[-1].strip() or request.META.get("REMOTE_ADDR", "")
+
+
+def take_token(key, capacity, period):
+    """
+    Takes a token from the bucket stored in the cache under `key`, which holds
+    `capacity` tokens and refills completely every `period` seconds. Returns 0
+    if a token was taken, otherwise the seconds until one becomes available.
+    The read-modify-write is not atomic, so concurrent requests may
+    occasionally be let through a nearly empty bucket. Buckets are shared by
+    the processes sharing the cache: with a per-process cache such as
+    LocMemCache, the default outside production, the limits apply per process.
+    """
+    now = time.time()
+    tokens, updated = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens < 1:
+        return (1 - tokens) * period / capacity
+    cache.set(key, (tokens - 1, now), period)
+    return 0
+
+
+def check_throttle(request, scope):
+    """
+    Returns a 429 response if the user or the client's IP has exhausted their
+    bucket for the scope, None otherwise.
+    """
+    buckets = [
+        (f"throttle:{scope}:ip:{client_ip(request)}", settings.THROTTLE_IP_RATES)
+    ]
+    if request.user.is_authenticated:
+        buckets.append(
+            (f"throttle:{scope}:user:{request.user.pk}", settings.THROTTLE_USER_RATES)
+        )
+    for key, rates in buckets:
+        if scope not in rates:
+            continue
+        wait = take_token(key, *rates[scope])
+        if wait:
+            response = render(request, "misc/429.html", status=429)
+            response["Retry-After"] = int(wait) + 1
+            return response
+
+
+def throttle(scope):
+    """
+    Decorator for function views that write, see check_throttle.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return check_throttle(request, scope) or view(request, *args, **kwargs)
+
+        wrapped.throttle_scope = scope
+        return wrapped
+
+    return decorator
+
+
+class ThrottleMixin:
+    """
+    Mixin for form views to throttle submissions per user and per IP
+    according to the rates configured for .throttle_scope.
+    """
+
+    throttle_scope = None
+
+    def post(self, request, *args, **kwargs):
+        return check_throttle(request, self.throttle_scope) or super().post(
+            request, *args, **kwargs
+        )
+
+
+def is_write_view(request, view_func):
+    """
+    Whether the request changes data: either an unsafe method or a
+    throttled view.
+    """
+    return request.method not in ("GET", "HEAD", "OPTIONS") or bool(
+        getattr(view_func, "throttle_scope", None)
+    )
@@ -0,0 +1,191 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from .models import Group, User
+
+STATS = ("l1_hits", "l2_hits", "misses")
+
+SEQUENCE_KEY = "tiered:seq"
+
+
+class TieredCache:
+    """
+    Two-tier cache for hot, rarely changing lookups: a per-process LRU of at
+    most TIERED_CACHE_MAX_ENTRIES values, each kept TIERED_CACHE_L1_TIMEOUT
+    seconds, in front of the shared cache, where values are kept
+    TIERED_CACHE_TIMEOUT seconds.
+
+    Invalidations are broadcast through the shared cache: each one is written
+    to a ring of TIERED_CACHE_LOG_SIZE numbered slots, which every process
+    reads at most every TIERED_CACHE_SYNC_INTERVAL seconds to drop the keys
+    it has in its LRU, or all of them if it fell more than a ring behind.
+    Other processes may thus serve a value up to that long after it is
+    invalidated. Values are shared by the threads of a process and must not
+    be modified.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.counts = dict.fromkeys(STATS, 0)
+        self.seen, self.synced_at = None, 0.0
+
+    def get_or_set(self, key, compute):
+        self._sync()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.counts["l1_hits"] += 1
+                return entry[0]
+        value, keep = cache.get(f"tiered:value:{key}"), True
+        if value is None:
+            # A value computed while anything was invalidated may have been
+            # read before the change, and is not kept.
+            sequence = cache.get(SEQUENCE_KEY)
+            value = compute()
+            keep = cache.get(SEQUENCE_KEY) == sequence
+            if keep:
+                cache.set(f"tiered:value:{key}", value, settings.TIERED_CACHE_TIMEOUT)
+            stat = "misses"
+        else:
+            stat = "l2_hits"
+        with self.lock:
+            self.counts[stat] += 1
+            if keep:
+                self.entries[key] = (value, now + settings.TIERED_CACHE_L1_TIMEOUT)
+                self.entries.move_to_end(key)
+                while len(self.entries) > settings.TIERED_CACHE_MAX_ENTRIES:
+                    self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys):
+        # Logged before the values are dropped, so that the lookups computing
+        # them meanwhile see the sequence move.
+        for key in keys:
+            cache.add(SEQUENCE_KEY, 0, None)
+            try:
+                sequence = cache.incr(SEQUENCE_KEY)
+            except ValueError:
+                # Evicted in between, which makes every process clear its LRU.
+                continue
+            cache.set(self._slot(sequence), (sequence, key), None)
+        cache.delete_many([f"tiered:value:{key}" for key in keys])
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Counters shared by all processes, as of their last sync: lookups
+        answered by the LRU, by the shared cache, and computed, with the hit
+        rate of each tier.
+        """
+        self._flush_counts()
+        values = cache.get_many([f"tiered:stats:{stat}" for stat in STATS])
+        stats = {stat: values.get(f"tiered:stats:{stat}", 0) for stat in STATS}
+        lookups = sum(stats.values())
+        stats["l1_hit_rate"] = stats["l1_hits"] / lookups if lookups else None
+        l2_lookups = lookups - stats["l1_hits"]
+        stats["l2_hit_rate"] = stats["l2_hits"] / l2_lookups if l2_lookups else None
+        return stats
+
+    def _slot(self, sequence):
+        return f"tiered:log:{sequence % settings.TIERED_CACHE_LOG_SIZE}"
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self.synced_at < settings.TIERED_CACHE_SYNC_INTERVAL:
+            return
+        self.synced_at = now
+        self._flush_counts()
+        sequence = cache.get(SEQUENCE_KEY, 0)
+        seen, self.seen = self.seen, sequence
+        if seen is None or sequence == seen:
+            return
+        if not seen < sequence <= seen + settings.TIERED_CACHE_LOG_SIZE:
+            # Fell behind the ring, or the shared cache was flushed.
+            self.clear()
+            return
+        logged = cache.get_many([self._slot(n) for n in range(seen + 1, sequence + 1)])
+        with self.lock:
+            for n in range(seen + 1, sequence + 1):
+                entry = logged.get(self._slot(n))
+                if not entry or entry[0] != n:
+                    self.entries.clear()
+                    return
+                self.entries.pop(entry[1], None)
+
+    def _flush_counts(self):
+        with self.lock:
+            counts, self.counts = self.counts, dict.fromkeys(STATS, 0)
+        for stat, count in counts.items():
+            if count:
+                cache.add(f"tiered:stats:{stat}", 0, None)
+                try:
+                    cache.incr(f"tiered:stats:{stat}", count)
+                except ValueError:
+                    pass
+
+
+tiered_cache = TieredCache()
+
+
+def group_by_slug(slug):
+    return tiered_cache.get_or_set(
+        f"group:{slug}", lambda: get_object_or_404(Group, slug=slug)
+    )
+
+
+def active_user(username):
+    return tiered_cache.get_or_set(
+        f"user:{username}",
+        lambda: get_object_or_404(User, username=username, is_active=True),
+    )
+
+
+def demo_user():
+    try:
+        # A copy, since logging in sets its last_login.
+        return copy.copy(active_user("testuser"))
+    except Http404:
+        return User.objects.get_or_create(username="testuser")[0]
+
+
+def _keys(instance):
+    if isinstance(instance, Group):
+        return [f"group:{instance.slug}"]
+    return [f"user:{instance.username}"]
+
+
+def invalidate_renamed(sender, instance, **kwargs):
+    # The lookup by the old slug or username goes too.
+    if instance.pk and kwargs.get("update_fields") != frozenset({"last_login"}):
+        old = sender.objects.filter(pk=instance.pk).first()
+        if old and _keys(old) != _keys(instance):
+            tiered_cache.invalidate(*_keys(old))
+
+
+def invalidate_lookups(sender, instance, **kwargs):
+    # Logins only touch last_login, which lookups are not used for.
+    if kwargs.get("update_fields") != frozenset({"last_login"}):
+        tiered_cache.invalidate(*_keys(instance))
+
+
+for model in (Group, User):
+    pre_save.connect(invalidate_renamed, sender=model)
+    post_save.connect(invalidate_lookups, sender=model)
+    post_delete.connect(invalidate_lookups, sender=model)
@@ -0,0 +1,104 @@
+import json
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+HASH_SALT = "posts.traffic"
+
+# URL arguments logged as they are, the others are anonymized.
+PLAIN_KWARGS = {"format"}
+
+
+def anonymize(value):
+    """
+    Stable, keyed hash of a user id or URL argument, which cannot be
+    reversed without SECRET_KEY but maps equal values to equal hashes.
+    """
+    return salted_hmac(HASH_SALT, str(value)).hexdigest()[:12]
+
+
+def should_capture():
+    rate = settings.TRAFFIC_CAPTURE_RATE
+    return bool(rate) and random.randrange(rate) == 0
+
+
+def record(request, response, started):
+    """
+    Shape of a request to a route of posts/urls.py: when, which route with
+    which anonymized arguments, by which anonymized user, for which page,
+    and how it went. None for requests to other routes.
+    """
+    match = request.resolver_match
+    if match is None or match.app_names or match.url_name not in _route_names():
+        return None
+    page = request.GET.get("page", "")
+    return {
+        "t": round(started, 3),
+        "m": request.method,
+        "r": match.url_name,
+        "k": {
+            name: value if name in PLAIN_KWARGS else anonymize(value)
+            for name, value in match.kwargs.items()
+            if isinstance(value, (str, int))
+        },
+        "u": anonymize(request.user.pk) if request.user.is_authenticated else None,
+        "p": int(page) if page.isdigit() else None,
+        "s": response.status_code,
+        "d": round((time.time() - started) * 1000, 1),
+    }
+
+
+def _route_names():
+    from . import urls
+
+    return {pattern.name for pattern in urls.urlpatterns}
+
+
+class TrafficLog:
+    """
+    Log of captured requests in TRAFFIC_CAPTURE_FILE, one JSON object per
+    line. Every line is appended with a single write to a file opened in
+    append mode, so the workers of a server can share the file.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fd = self.key = None
+
+    def append(self, entry):
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+        with self.lock:
+            # Reopened after a fork rather than sharing the parent's descriptor.
+            key = (os.getpid(), settings.TRAFFIC_CAPTURE_FILE)
+            if self.key != key:
+                if self.key and self.key[0] == os.getpid():
+                    os.close(self.fd)
+                path = settings.TRAFFIC_CAPTURE_FILE
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                self.key = key
+            os.write(self.fd, line)
+
+
+traffic_log = TrafficLog()
+
+
+def read_log(path):
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of the sorted values.
+    """
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
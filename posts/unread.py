@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.urls import Resolver404, resolve, reverse
+
+from .models import FeedMark, Group, Post
+
+GROUP_FEED = "group:"
+
+MARK_SQL = f"""
+    INSERT INTO {FeedMark._meta.db_table} (user_id, feed, last_seen_id, date)
+    VALUES (%s, %s, %s, NOW())
+    ON CONFLICT (user_id, feed) DO UPDATE SET
+        last_seen_id = GREATEST(
+            {FeedMark._meta.db_table}.last_seen_id, EXCLUDED.last_seen_id
+        ),
+        date = EXCLUDED.date
+"""
+
+
+def feed_of(path):
+    """
+    Feed key of the page at the path, None if it is not a feed with unread
+    counts.
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    if match.url_name == "subscriptions_posts":
+        return "subscriptions"
+    if match.url_name == "group_posts":
+        return GROUP_FEED + match.kwargs["slug"]
+
+
+def _group_slug(feed):
+    if feed.startswith(GROUP_FEED):
+        return feed[len(GROUP_FEED) :]
+
+
+def _posts(user, feed):
+    if feed == "subscriptions":
+        return Post.objects.visible().filter(author__followers__follower=user)
+    return Post.objects.visible().filter(group__slug=_group_slug(feed))
+
+
+def _cache_key(user):
+    return f"unread:{user.pk}"
+
+
+def mark_seen(user, feed, post_id):
+    """
+    Raises the user's high-water mark of the feed to the post, with a single
+    upsert, or none if the cached mark is already there.
+    """
+    unread = cache.get(_cache_key(user))
+    if unread and feed in unread and unread[feed]["last_seen_id"] >= post_id:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(MARK_SQL, [user.pk, feed, post_id])
+    cache.delete(_cache_key(user))
+
+
+def unread_counts(user):
+    """
+    Unread counts of the feeds the user has visited, keyed by feed. Every
+    count is a LIMIT UNREAD_CAP + 1 query, badged "<cap>+" when it exceeds
+    the cap, and the counts are cached for UNREAD_CACHE_TIMEOUT seconds
+    or until the user marks a feed seen.
+    """
+    key = _cache_key(user)
+    unread = cache.get(key)
+    if unread is None:
+        marks = dict(
+            FeedMark.objects.filter(user=user).values_list("feed", "last_seen_id")
+        )
+        titles = dict(
+            Group.objects.filter(
+                slug__in=[slug for slug in map(_group_slug, marks) if slug]
+            ).values_list("slug", "title")
+        )
+        unread = {}
+        for feed, last_seen_id in marks.items():
+            slug = _group_slug(feed)
+            if feed == "subscriptions":
+                title, url = "Subscriptions", reverse("subscriptions_posts")
+            elif slug in titles:
+                title, url = titles[slug], reverse("group_posts", args=(slug,))
+            else:
+                continue
+            count = (
+                _posts(user, feed)
+                .filter(id__gt=last_seen_id)[: settings.UNREAD_CAP + 1]
+                .count()
+            )
+            unread[feed] = {
+                "title": title,
+                "url": url,
+                "last_seen_id": last_seen_id,
+                "count": count,
+                "badge": (
+                    f"{settings.UNREAD_CAP}+"
+                    if count > settings.UNREAD_CAP
+                    else str(count)
+                ),
+            }
+        cache.set(key, unread, settings.UNREAD_CACHE_TIMEOUT)
+    return unread
@@ -1,14 +1,44 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 
 urlpatterns = [
     path("", views.IndexPosts.as_view(), name="index_posts"),
     path("post", views.NewPost.as_view(), name="new_post"),
+    path(
+        "posts.<format>",
+        views.syndication,
+        {"feed_class": feeds.IndexPostsFeed},
+        name="index_posts_feed",
+    ),
     path("groups/<slug>/posts", views.GroupPosts.as_view(), name="group_posts"),
+    path(
+        "groups/<slug>/posts.<format>",
+        views.syndication,
+        {"feed_class": feeds.GroupPostsFeed},
+        name="group_posts_feed",
+    ),
+    path("tags/<tag>/posts", views.TagPosts.as_view(), name="tag_posts"),
     path("feed", views.SubscriptionsPosts.as_view(), name="subscriptions_posts"),
+    path("mentions", views.MentionsPosts.as_view(), name="mentions_posts"),
+    path("liked", views.LikedPosts.as_view(), name="liked_posts"),
+    path("viewer", views.viewer, name="viewer"),
+    path("updates", views.new_posts, name="new_posts"),
+    path("staff/profiles", views.profiles, name="profiles"),
+    path("staff/cache", views.cache_stats, name="cache_stats"),
+    path(
+        "staff/profiles/<filename>",
+        views.download_profile,
+        name="download_profile",
+    ),
     path("<username>/posts", views.ProfilePosts.as_view(), name="profile_posts"),
+    path(
+        "<username>/posts.<format>",
+        views.syndication,
+        {"feed_class": feeds.ProfilePostsFeed},
+        name="profile_posts_feed",
+    ),
     path("<username>/follow", views.follow, name="follow"),
     path("<username>/unfollow", views.unfollow, name="unfollow"),
     path("<username>/followers", views.Followers.as_view(), name="followers"),
@@ -21,14 +51,31 @@ urlpatterns = [
         views.NewComment.as_view(),
         name="new_comment",
     ),
+    path("<username>/posts/<int:post_id>/like", views.like, name="like"),
+    path("<username>/posts/<int:post_id>/unlike", views.unlike, name="unlike"),
     path(
         "<username>/posts/<int:post_id>/edit",
         views.EditPost.as_view(),
         name="edit_post",
     ),
+    path(
+        "<username>/posts/<int:post_id>/comments",
+        views.post_comments,
+        name="post_comments",
+    ),
     path(
         "<username>/comments/<int:comment_id>",
         views.EditComment.as_view(),
         name="edit_comment",
     ),
+    path(
+        "<username>/comments/<int:comment_id>/reply",
+        views.NewReply.as_view(),
+        name="new_reply",
+    ),
+    path(
+        "<username>/comments/<int:comment_id>/replies",
+        views.comment_replies,
+        name="comment_replies",
+    ),
 ]
@@ -1,12 +1,47 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse, reverse_lazy
+from django.template.loader import get_template, render_to_string
+from django.urls import Resolver404, resolve, reverse, reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import (
+    parse_http_date_safe,
+    quote_etag,
+    url_has_allowed_host_and_scheme,
+)
+from django.utils.safestring import mark_safe
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, ListView, UpdateView
 
+from . import activity, caching, likes, profiler, threads, unread
+from .caching import CachedViewMixin
+from .feeds import FEED_TYPES
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .indexing import index_texts
+from .models import Comment, Follow, Hashtag, Like, Mention, Post, User
+from .notifier import notifier
+from .throttling import ThrottleMixin, throttle
+from .tiered import active_user, demo_user, group_by_slug, tiered_cache
+from .viewcounts import attach_view_counts, view_counter, viewer_of
 
 
 # Utilities ----------------------------------------------------------------------------
@@ -17,8 +52,7 @@ def _login_as_testuser(request):
     Logs the user in as @testuser for demo purposes.
     """
     if not request.user.is_authenticated:
-        user, _ = User.objects.get_or_create(username="testuser")
-        login(request, user)
+        login(request, demo_user())
 
 
 class SupplementContextMixin:
@@ -40,17 +74,120 @@ class FilterPosts(SupplementContextMixin):
     """
 
     paginate_by = 20
+    live_updates = True
 
     def _filter_posts(self):
         return {}
 
+    def _live_topics(self):
+        """
+        Topics of the new posts that may belong to the feed, see notifier.
+        """
+        return {"all"}
+
     def get_queryset(self):
-        return Post.objects.filter(**self._filter_posts()).order_by("-date")
+        return Post.objects.visible().filter(**self._filter_posts()).order_by("-date")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context["page_obj"]
+        page.object_list = list(page.object_list)
+        attach_view_counts(page.object_list)
+        likes.attach_like_counts(page.object_list)
+        return context
 
     def _supplement_context_data(self):
         return self._filter_posts()
 
 
+class CursorPage:
+    """
+    Page of a feed paginated by post id, with the cursor of the next page.
+    """
+
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self.has_previous, self.has_next = has_previous, has_next
+        self.next_cursor = object_list[-1].id if has_next else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginationMixin:
+    """
+    Mixin for post feeds to paginate by post id with ?before=<id> links
+    instead of page numbers, so that deep pages are as cheap as the first.
+    """
+
+    cursor_pagination = True
+
+    def get_queryset(self):
+        queryset = super().get_queryset().order_by("-id")
+        before = self.request.GET.get("before", "")
+        if before.isdigit():
+            queryset = queryset.filter(id__lt=before)
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        posts = list(queryset[: page_size + 1])
+        page = CursorPage(
+            posts[:page_size],
+            has_previous="before" in self.request.GET,
+            has_next=len(posts) > page_size,
+        )
+        return None, page, page.object_list, page.has_previous or page.has_next
+
+
+class StreamingMixin:
+    """
+    Mixin for list views to stream their response when STREAMING_RESPONSES is
+    set. The page is rendered with `stream` in place of the items of
+    ._stream_queryset, by default those of the page, and the part before it,
+    with the head and nav, is sent at once. The items follow one by one,
+    rendered with .stream_item_template while being read STREAM_CHUNK_SIZE
+    rows at a time, and then the rest of the page. .stream_paginate_by
+    replaces .paginate_by while streaming. ._stream_queryset may also return
+    an iterator that loads the items in chunks itself.
+    """
+
+    stream_item_template = None
+    stream_paginate_by = None
+    stream_marker = mark_safe("<!-- stream -->")
+
+    def _stream_queryset(self, context):
+        return context["page_obj"].object_list
+
+    def get_paginate_by(self, queryset):
+        if settings.STREAMING_RESPONSES and self.stream_paginate_by:
+            return self.stream_paginate_by
+        return super().get_paginate_by(queryset)
+
+    def render_to_response(self, context, **response_kwargs):
+        if not settings.STREAMING_RESPONSES:
+            return super().render_to_response(context, **response_kwargs)
+        items = self._stream_queryset(context)
+        context.update(streaming=True, stream=self.stream_marker)
+        page = render_to_string(self.get_template_names(), context, self.request)
+        head, tail = page.split(self.stream_marker, 1)
+        response = StreamingHttpResponse(self._stream(head, items, tail))
+        # Keeps nginx from buffering the response up.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def _stream(self, head, items, tail):
+        yield head
+        template = get_template(self.stream_item_template)
+        if hasattr(items, "iterator"):
+            items = items.iterator(chunk_size=settings.STREAM_CHUNK_SIZE)
+        for item in items:
+            yield template.render({"item": item, "user": self.request.user})
+        yield tail
+
+
 class IsOwnerMixin:
     """
     Mixin for modification views to redirect the user to the success url
@@ -73,7 +210,7 @@ class IsOwnerMixin:
 # Static views -------------------------------------------------------------------------
 
 
-class IndexPosts(FilterPosts, ListView):
+class IndexPosts(CachedViewMixin, FilterPosts, ListView):
     """
     /
     Feed of all posts on the platform.
@@ -81,12 +218,14 @@ class IndexPosts(FilterPosts, ListView):
 
     template_name = "index.html"
 
-    def render_to_response(self, *args, **kwargs):
-        _login_as_testuser(self.request)
-        return super().render_to_response(*args, **kwargs)
+    def _cache_tags(self):
+        return ["posts:all"]
+
+    def _supplement_context_data(self):
+        return {"demo_login": True}
 
 
-class GroupPosts(FilterPosts, ListView):
+class GroupPosts(CachedViewMixin, FilterPosts, ListView):
     """
     /groups/<slug>/posts
     Feed of posts belonging to the group.
@@ -95,10 +234,21 @@ class GroupPosts(FilterPosts, ListView):
     template_name = "group.html"
 
     def _filter_posts(self):
-        return {"group": get_object_or_404(Group, slug=self.kwargs["slug"])}
+        return {"group": group_by_slug(self.kwargs["slug"])}
+
+    def _live_topics(self):
+        return {f"group:{self._filter_posts()['group'].id}"}
+
+    def _cache_tags(self):
+        return [f"posts:group:{self.kwargs['slug']}"]
+
+    def _supplement_context_data(self):
+        context = self._filter_posts()
+        context["activity"] = activity.group_activity(context["group"])
+        return context
 
 
-class ProfilePosts(FilterPosts, ListView):
+class ProfilePosts(CachedViewMixin, FilterPosts, ListView):
     """
     /<username>/posts
     User's profile card together with a feed of the user's posts.
@@ -107,7 +257,19 @@ class ProfilePosts(FilterPosts, ListView):
     template_name = "profile_posts.html"
 
     def _filter_posts(self):
-        return {"author": get_object_or_404(User, username=self.kwargs["username"])}
+        return {"author": active_user(self.kwargs["username"])}
+
+    def _live_topics(self):
+        return {f"author:{self._filter_posts()['author'].id}"}
+
+    def _cache_tags(self):
+        username = self.kwargs["username"]
+        return [f"posts:user:{username}", f"user:{username}"]
+
+    def _supplement_context_data(self):
+        context = self._filter_posts()
+        context["activity"] = activity.user_activity(context["author"])
+        return context
 
 
 class SubscriptionsPosts(LoginRequiredMixin, FilterPosts, ListView):
@@ -125,8 +287,79 @@ class SubscriptionsPosts(LoginRequiredMixin, FilterPosts, ListView):
             )
         }
 
+    def _live_topics(self):
+        return {
+            f"author:{author_id}"
+            for author_id in self._filter_posts()["author__in"].values_list(
+                "id", flat=True
+            )
+        }
+
+
+class TagPosts(CachedViewMixin, CursorPaginationMixin, FilterPosts, ListView):
+    """
+    /tags/<tag>/posts
+    Feed of posts using the #tag.
+    """
+
+    template_name = "tag.html"
+
+    def _filter_posts(self):
+        return {
+            "id__in": Hashtag.objects.filter(
+                tag=self.kwargs["tag"].lower(), comment=None
+            ).values("post_id")
+        }
+
+    def _live_topics(self):
+        return {f"tag:{self.kwargs['tag'].lower()}"}
+
+    def _cache_tags(self):
+        return [f"posts:tag:{self.kwargs['tag'].lower()}"]
+
+    def _supplement_context_data(self):
+        return {"tag": self.kwargs["tag"].lower()}
+
+
+class MentionsPosts(LoginRequiredMixin, CursorPaginationMixin, FilterPosts, ListView):
+    """
+    /mentions
+    Feed of posts mentioning the current user in their text or comments.
+    """
+
+    template_name = "mentions.html"
+
+    def _filter_posts(self):
+        return {
+            "id__in": Mention.objects.filter(user=self.request.user).values("post_id")
+        }
+
+    def _live_topics(self):
+        return {f"mention:{self.request.user.username}"}
+
+    def _supplement_context_data(self):
+        return {}
+
+
+class LikedPosts(LoginRequiredMixin, CursorPaginationMixin, FilterPosts, ListView):
+    """
+    /liked
+    Feed of posts liked by the current user, newest post first rather than
+    last liked first, so that it pages by post id like the other feeds.
+    """
+
+    template_name = "liked.html"
+    # Posts are liked after they are published.
+    live_updates = False
+
+    def _filter_posts(self):
+        return {"id__in": Like.objects.filter(user=self.request.user).values("post_id")}
+
+    def _supplement_context_data(self):
+        return {}
+
 
-class SinglePost(LoginRequiredMixin, FilterPosts, ListView):
+class SinglePost(LoginRequiredMixin, StreamingMixin, FilterPosts, ListView):
     """
     /<username>/posts/<post_id>
     User's profile card together with a single post, comments on the post,
@@ -134,59 +367,78 @@ class SinglePost(LoginRequiredMixin, FilterPosts, ListView):
     """
 
     template_name = "profile_posts.html"
+    live_updates = False
+    stream_item_template = "comment.html"
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        view_counter.record(self.post.id, viewer_of(request))
+        return response
 
     def _filter_posts(self):
-        self.post = get_object_or_404(Post, id=self.kwargs["post_id"])
+        self.post = get_object_or_404(Post.objects.visible(), id=self.kwargs["post_id"])
         return {"id": self.kwargs["post_id"]}
 
     def _supplement_context_data(self):
+        if settings.STREAMING_RESPONSES:
+            comments, comments_after = threads.iter_thread(self.post), None
+        else:
+            comments, comments_after = threads.load_thread(self.post)
         return {
-            "author": get_object_or_404(User, username=self.kwargs["username"]),
+            "author": active_user(self.kwargs["username"]),
             "comment_form": CommentForm(),
-            "comments": Comment.objects.filter(post=self.post).order_by("date"),
+            "comments": comments,
+            "comments_after": comments_after,
         }
 
+    def _stream_queryset(self, context):
+        return context["comments"]
+
 
-class Followers(SupplementContextMixin, ListView):
+class Followers(StreamingMixin, SupplementContextMixin, ListView):
     """
     /<username>/followers
     User's profile card together with a list of the user's followers.
     """
 
     paginate_by = 20
+    stream_paginate_by = 1000
+    stream_item_template = "follow.html"
     template_name = "profile_follows.html"
 
     def get_queryset(self):
         return User.objects.filter(
-            followees__followee__username=self.kwargs["username"]
+            followees__followee__username=self.kwargs["username"], is_active=True
         ).order_by("username")
 
     def _supplement_context_data(self):
-        return {"author": get_object_or_404(User, username=self.kwargs["username"])}
+        return {"author": active_user(self.kwargs["username"])}
 
 
-class Followees(SupplementContextMixin, ListView):
+class Followees(StreamingMixin, SupplementContextMixin, ListView):
     """
     /<username>/followeees
     User's profile card together with a list of the user's followees.
     """
 
     paginate_by = 20
+    stream_paginate_by = 1000
+    stream_item_template = "follow.html"
     template_name = "profile_follows.html"
 
     def get_queryset(self):
         return User.objects.filter(
-            followers__follower__username=self.kwargs["username"]
+            followers__follower__username=self.kwargs["username"], is_active=True
         ).order_by("username")
 
     def _supplement_context_data(self):
-        return {"author": get_object_or_404(User, username=self.kwargs["username"])}
+        return {"author": active_user(self.kwargs["username"])}
 
 
 # Action views -------------------------------------------------------------------------
 
 
-class NewPost(LoginRequiredMixin, CreateView):
+class NewPost(LoginRequiredMixin, ThrottleMixin, CreateView):
     """
     /post
     A form to publish a new post.
@@ -194,41 +446,88 @@ class NewPost(LoginRequiredMixin, CreateView):
 
     form_class = PostForm
     template_name = "new_post.html"
+    throttle_scope = "post"
     success_url = reverse_lazy("index_posts")
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        # Announced to live feeds on commit, once tag and mention feeds have it.
+        with transaction.atomic():
+            response = super().form_valid(form)
+            index_texts(posts=[self.object])
+        return response
 
 
-class NewComment(LoginRequiredMixin, CreateView):
+class NewComment(LoginRequiredMixin, ThrottleMixin, CreateView):
     """
     /<username>/posts/<post_id>/comment
     A form to publish a new comment on the post.
     """
 
     form_class = CommentForm
+    throttle_scope = "comment"
 
     def form_valid(self, form):
-        self.post = get_object_or_404(Post, id=self.kwargs["post_id"])
-        form.instance.post, form.instance.author = self.post, self.request.user
-        return super().form_valid(form)
+        form.instance.post, form.instance.author = self._post(), self.request.user
+        response = super().form_valid(form)
+        index_texts(comments=[self.object])
+        return response
+
+    def _post(self):
+        return get_object_or_404(Post.objects.visible(), id=self.kwargs["post_id"])
 
     def get_success_url(self):
         return reverse("single_post", kwargs=self.kwargs)
 
 
+class NewReply(NewComment):
+    """
+    /<username>/comments/<comment_id>/reply
+    A form to reply to the comment.
+    """
+
+    template_name = "new_reply.html"
+
+    @cached_property
+    def parent(self):
+        return _visible_comment(self.kwargs["username"], self.kwargs["comment_id"])
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(parent=self.parent, **kwargs)
+
+    def form_valid(self, form):
+        form.instance.parent = self.parent
+        return super().form_valid(form)
+
+    def _post(self):
+        return self.parent.post
+
+    def get_success_url(self):
+        return (
+            reverse(
+                "single_post",
+                args=(self.parent.post.author.username, self.parent.post.id),
+            )
+            + f"#comment_{self.object.id}"
+        )
+
+
 class EditPost(LoginRequiredMixin, IsOwnerMixin, UpdateView):
     """
     /<username>/posts/<post_id>/edit
     A form to edit the post.
     """
 
-    model = Post
+    queryset = Post.objects.visible()
     form_class = PostForm
     pk_url_kwarg = "post_id"
     template_name = "edit_post.html"
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        index_texts(posts=[self.object])
+        return response
+
     def get_success_url(self):
         return reverse("single_post", kwargs=self.kwargs)
 
@@ -244,19 +543,26 @@ class EditComment(LoginRequiredMixin, IsOwnerMixin, UpdateView):
     pk_url_kwarg = "comment_id"
     template_name = "edit_comment.html"
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        index_texts(comments=[self.object])
+        return response
+
     def get_success_url(self):
         return reverse(
             "single_post", args=(self.object.post.author.username, self.object.post.id)
         )
 
 
+@require_POST
 @login_required
+@throttle("follow")
 def follow(request, username):
     """
     /<username>/follow
     Follow (subscribe to) the user.
     """
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User, username=username, is_active=True)
     if (
         author == request.user
         or Follow.objects.filter(followee=author, follower=request.user).exists()
@@ -266,7 +572,9 @@ def follow(request, username):
     return redirect("profile_posts", username)
 
 
+@require_POST
 @login_required
+@throttle("follow")
 def unfollow(request, username):
     """
     /<username>/unfollow
@@ -278,6 +586,303 @@ def unfollow(request, username):
     return redirect("profile_posts", username)
 
 
+def _redirect_next(request, username, post_id):
+    next_url = request.GET.get("next")
+    if next_url and url_has_allowed_host_and_scheme(next_url, {request.get_host()}):
+        return redirect(next_url)
+    return redirect("single_post", username, post_id)
+
+
+@require_POST
+@login_required
+@throttle("like")
+def like(request, username, post_id):
+    """
+    /<username>/posts/<post_id>/like
+    Like the post, unless already liked, and return to ?next=.
+    """
+    likes.like(request.user, get_object_or_404(Post.objects.visible(), id=post_id))
+    return _redirect_next(request, username, post_id)
+
+
+@require_POST
+@login_required
+@throttle("like")
+def unlike(request, username, post_id):
+    """
+    /<username>/posts/<post_id>/unlike
+    Unlike the post, if liked, and return to ?next=.
+    """
+    likes.unlike(request.user, get_object_or_404(Post, id=post_id))
+    return _redirect_next(request, username, post_id)
+
+
+# Comment threads ----------------------------------------------------------------------
+
+
+def _visible_comment(username, comment_id):
+    """
+    The comment by the active user on a visible post, or 404.
+    """
+    return get_object_or_404(
+        Comment.objects.select_related("post__author"),
+        id=comment_id,
+        author__username=username,
+        author__is_active=True,
+        post__in=Post.objects.visible(),
+    )
+
+
+def _thread(request, post, parent=None):
+    comments, comments_after = threads.load_thread(
+        post, parent, after=request.GET.get("after", "")
+    )
+    return render(
+        request,
+        "thread.html",
+        {
+            "post": post,
+            "parent": parent,
+            "comments": comments,
+            "comments_after": comments_after,
+        },
+    )
+
+
+@login_required
+def post_comments(request, username, post_id):
+    """
+    /<username>/posts/<post_id>/comments?after=<path>
+    The next window of top-level comments on the post with their first
+    replies, as a fragment of the post page.
+    """
+    post = get_object_or_404(
+        Post.objects.visible().select_related("author"),
+        id=post_id,
+        author__username=username,
+    )
+    return _thread(request, post)
+
+
+@login_required
+def comment_replies(request, username, comment_id):
+    """
+    /<username>/comments/<comment_id>/replies?after=<path>
+    The next window of replies to the comment with their first replies,
+    as a fragment of the post page, for threads too long or too deep to be
+    shown whole.
+    """
+    parent = _visible_comment(username, comment_id)
+    return _thread(request, parent.post, parent)
+
+
+# Personalization ----------------------------------------------------------------------
+
+
+@ensure_csrf_cookie
+def viewer(request):
+    """
+    /viewer
+    The viewer-dependent parts of pages, which are rendered identically for
+    everyone: the viewer's username, which of the ?posts= ids they may edit,
+    which of them they like, which of the ?authors= usernames they follow
+    and the unread counts of their feeds. ?feed=<feed path>&seen=<post id>
+    first marks the feed seen up to the post. Sets the CSRF cookie, which
+    personalize.js copies into the forms of cached pages.
+    """
+    if request.GET.get("demo_login"):
+        _login_as_testuser(request)
+    payload = {
+        "username": None,
+        "editable_posts": [],
+        "liked_posts": [],
+        "follows": [],
+        "unread": {},
+    }
+    if request.user.is_authenticated:
+        feed = unread.feed_of(request.GET.get("feed", ""))
+        seen = request.GET.get("seen", "")
+        if feed and seen.isdigit():
+            unread.mark_seen(request.user, feed, int(seen))
+        post_ids = [
+            id for id in request.GET.get("posts", "").split(",") if id.isdigit()
+        ]
+        authors = [
+            author for author in request.GET.get("authors", "").split(",") if author
+        ]
+        payload = {
+            "username": request.user.username,
+            "editable_posts": list(
+                Post.objects.filter(
+                    id__in=post_ids[:100], author=request.user
+                ).values_list("id", flat=True)
+            ),
+            "liked_posts": list(
+                Like.objects.filter(
+                    post_id__in=post_ids[:100], user=request.user
+                ).values_list("post_id", flat=True)
+            ),
+            "follows": list(
+                Follow.objects.filter(
+                    follower=request.user, followee__username__in=authors[:100]
+                ).values_list("followee__username", flat=True)
+            ),
+            "unread": unread.unread_counts(request.user),
+        }
+    response = JsonResponse(payload)
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+# Live updates -------------------------------------------------------------------------
+
+
+def _feed_view(request, view_class, match):
+    view = view_class()
+    view.setup(request, *match.args, **match.kwargs)
+    if isinstance(view, LoginRequiredMixin) and not request.user.is_authenticated:
+        raise PermissionDenied
+    return view
+
+
+def _live_topics(request, view_class, match):
+    notifier.start()
+    return _feed_view(request, view_class, match)._live_topics()
+
+
+def _new_posts(request, view_class, match, after):
+    """
+    Posts of the feed newer than `after`: their count and the rendered
+    cards of the newest of them.
+    """
+    view = _feed_view(request, view_class, match)
+    posts = view.get_queryset().filter(id__gt=after)
+    newest = list(posts.select_related("author", "group")[: view.paginate_by])
+    return {
+        "count": posts.count() if len(newest) == view.paginate_by else len(newest),
+        "newest_id": max((post.id for post in newest), default=after),
+        "cards": [render_to_string("post.html", {"post": post}) for post in newest],
+    }
+
+
+async def new_posts(request):
+    """
+    /updates?feed=<feed path>&after=<post id>
+    Long-polls for posts newer than `after` in the feed at `feed`. Answers
+    as soon as there are any, or after NEW_POSTS_TIMEOUT seconds with the id
+    to poll after next, past the posts that turned out not to be in the feed.
+    Only posts announced for the topics of the feed are looked up.
+    """
+    try:
+        after, match = int(request.GET["after"]), resolve(request.GET["feed"])
+    except (KeyError, ValueError, Resolver404):
+        return HttpResponseBadRequest()
+    view_class = getattr(match.func, "view_class", None)
+    if not getattr(view_class, "live_updates", False):
+        return HttpResponseBadRequest()
+    feed_posts = sync_to_async(_new_posts, thread_sensitive=True)
+    topics = await sync_to_async(_live_topics, thread_sensitive=True)(
+        request, view_class, match
+    )
+    deadline, seen = time.monotonic() + settings.NEW_POSTS_TIMEOUT, after
+    if after < notifier.seeded_id:
+        # Posts from before the notifier started are not announced.
+        payload = await feed_posts(request, view_class, match, after)
+        if payload["count"]:
+            return JsonResponse(payload)
+        seen = notifier.seeded_id
+    while True:
+        remaining = deadline - time.monotonic()
+        latest_id = await notifier.wait_newer(topics, seen, max(remaining, 0))
+        if latest_id <= seen:
+            return JsonResponse({"count": 0, "newest_id": seen, "cards": []})
+        payload = await feed_posts(request, view_class, match, after)
+        if payload["count"]:
+            return JsonResponse(payload)
+        seen = latest_id
+
+
+# Syndication --------------------------------------------------------------------------
+
+
+def syndication(request, feed_class, format, **kwargs):
+    """
+    /posts.<atom|rss>, /<username>/posts.<atom|rss>, /groups/<slug>/posts.<atom|rss>
+    Atom or RSS feed of the latest posts of the site, the user or the group.
+    The XML is cached until they post, and polls with a matching ETag or
+    Last-Modified are answered with 304 Not Modified from the cache alone.
+    """
+    if format not in FEED_TYPES:
+        raise Http404
+    feed = feed_class(format)
+
+    def render():
+        response = feed(request, **kwargs)
+        return (
+            response.content,
+            response["Content-Type"],
+            response.get("Last-Modified"),
+        )
+
+    content, content_type, last_modified = caching.get_or_compute(
+        "syndication:" + hashlib.md5(request.path.encode()).hexdigest(),
+        render,
+        settings.SYNDICATION_CACHE_TIMEOUT,
+        tags=(feed.cache_tag(**kwargs),),
+    )
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+    )
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = last_modified
+    return response
+
+
+# Staff --------------------------------------------------------------------------------
+
+
+@staff_member_required
+def profiles(request):
+    """
+    /staff/profiles
+    Saved request profiles, and the token to pass as ?profile= or in the
+    X-Profile header to profile a request.
+    """
+    return render(
+        request,
+        "profiles.html",
+        {
+            "profiles": profiler.list_profiles(),
+            "token": profiler.make_token(request.user),
+        },
+    )
+
+
+@staff_member_required
+def cache_stats(request):
+    """
+    /staff/cache
+    Page and fragment cache counters, see posts.caching.stats, and the
+    two-tier cache's under "tiered", see posts.tiered.TieredCache.stats.
+    """
+    return JsonResponse({**caching.stats(), "tiered": tiered_cache.stats()})
+
+
+@staff_member_required
+def download_profile(request, filename):
+    """
+    /staff/profiles/<filename>
+    Download a saved profile, .json or .prof.
+    """
+    return FileResponse(open(profiler.profile_path(filename), "rb"), as_attachment=True)
+
+
 def _404(request, exception):
     return render(request, "misc/404.html", {"path": request.path}, status=404)
 
@@ -0,0 +1,22 @@
+// Loads the next comments or replies of a thread in place of the "show more"
+// link that was clicked, rather than opening the fragment on its own.
+(function () {
+    document.addEventListener("click", function (event) {
+        var link = event.target.closest("[data-more-comments]");
+        if (!link) {
+            return;
+        }
+        event.preventDefault();
+        fetch(link.href, {credentials: "same-origin"})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text();
+            })
+            .then(function (html) {
+                link.insertAdjacentHTML("beforebegin", html);
+                link.remove();
+            });
+    });
+})();
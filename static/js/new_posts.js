@@ -0,0 +1,50 @@
+// Long-polls /updates for posts newer than the newest one on the page and
+// offers to show them above the feed instead of reloading the page.
+(function () {
+    var container = document.querySelector("[data-new-posts-url]");
+    if (!container) {
+        return;
+    }
+    var button = container.querySelector("[data-new-posts-button]"),
+        counter = container.querySelector("[data-new-posts-count]"),
+        list = container.querySelector("[data-new-posts]"),
+        after = container.dataset.after,
+        pending = [],
+        count = 0;
+
+    function poll() {
+        var url = new URL(container.dataset.newPostsUrl, window.location.href);
+        url.searchParams.set("feed", container.dataset.feed);
+        url.searchParams.set("after", after);
+        fetch(url, {credentials: "same-origin"})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.json();
+            })
+            .then(function (update) {
+                // Past the newest post shown, or the posts checked without one.
+                after = update.newest_id;
+                if (update.count) {
+                    pending = update.cards.concat(pending);
+                    count += update.count;
+                    counter.textContent = count;
+                    button.hidden = false;
+                }
+                poll();
+            })
+            .catch(function () {
+                setTimeout(poll, 10000);
+            });
+    }
+
+    button.addEventListener("click", function () {
+        list.insertAdjacentHTML("afterbegin", pending.join(""));
+        pending = [];
+        count = 0;
+        button.hidden = true;
+    });
+
+    poll();
+})();
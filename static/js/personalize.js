@@ -0,0 +1,93 @@
+// Pages are rendered identically for every viewer. This script fetches the
+// viewer's payload from /viewer and reveals the parts that depend on them:
+// the nav with unread badges, edit links on their own posts, like buttons
+// and follow buttons. Feed pages also mark the feed seen up to their newest post.
+// Forms of cached pages get the CSRF token from the cookie /viewer sets.
+(function () {
+    var script = document.currentScript;
+
+    function all(selector, root) {
+        return Array.prototype.slice.call((root || document).querySelectorAll(selector));
+    }
+
+    function show(element, visible) {
+        element.hidden = !visible;
+    }
+
+    function csrfToken() {
+        var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]*)/);
+        return match ? decodeURIComponent(match[1]) : "";
+    }
+
+    function apply(viewer) {
+        all("[data-viewer]").forEach(function (element) {
+            show(element, (element.dataset.viewer === "authenticated") === !!viewer.username);
+        });
+        all("[data-viewer-username]").forEach(function (element) {
+            element.textContent = viewer.username;
+        });
+        all("[data-csrf-token]").forEach(function (input) {
+            input.value = csrfToken();
+        });
+        all("[data-unread-feeds]").forEach(function (container) {
+            Object.keys(viewer.unread).forEach(function (feed) {
+                var unread = viewer.unread[feed], link, badge;
+                if (!unread.count) {
+                    return;
+                }
+                link = document.createElement("a");
+                link.className = "btn btn-outline-secondary mr-1";
+                link.href = unread.url;
+                link.textContent = unread.title + " ";
+                badge = document.createElement("span");
+                badge.className = "badge badge-primary";
+                badge.textContent = unread.badge;
+                link.appendChild(badge);
+                container.appendChild(link);
+            });
+        });
+        all("[data-viewer-profile]").forEach(function (element) {
+            element.href = element.href.replace("__username__", viewer.username);
+        });
+        all("[data-edit-post]").forEach(function (element) {
+            show(element, viewer.editable_posts.indexOf(+element.dataset.editPost) !== -1);
+        });
+        all("[data-like-post]").forEach(function (element) {
+            show(element, !!viewer.username && viewer.liked_posts.indexOf(+element.dataset.likePost) === -1);
+        });
+        all("[data-unlike-post]").forEach(function (element) {
+            show(element, viewer.liked_posts.indexOf(+element.dataset.unlikePost) !== -1);
+        });
+        all("[data-author-actions]").forEach(function (actions) {
+            var author = actions.dataset.authorActions,
+                isAuthor = author === viewer.username,
+                follows = viewer.follows.indexOf(author) !== -1;
+            all("[data-viewer-is-author]", actions).forEach(function (element) {
+                show(element, isAuthor);
+            });
+            all("[data-viewer-follows]", actions).forEach(function (element) {
+                show(element, !isAuthor && follows);
+            });
+            all("[data-viewer-not-follows]", actions).forEach(function (element) {
+                show(element, !isAuthor && !follows);
+            });
+        });
+    }
+
+    var url = new URL(script.dataset.url, window.location.href);
+    url.searchParams.set("posts", all("[data-edit-post]").map(function (element) {
+        return element.dataset.editPost;
+    }).join(","));
+    url.searchParams.set("authors", all("[data-author-actions]").map(function (element) {
+        return element.dataset.authorActions;
+    }).join(","));
+    all("[data-new-posts-url]").forEach(function (feed) {
+        if (+feed.dataset.after) {
+            url.searchParams.set("feed", feed.dataset.feed);
+            url.searchParams.set("seen", feed.dataset.after);
+        }
+    });
+    fetch(url, {credentials: "same-origin"})
+        .then(function (response) { return response.json(); })
+        .then(apply);
+})();
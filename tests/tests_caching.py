@@ -0,0 +1,147 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client
+
+from posts import caching, tiered
+from posts.models import Follow, Group, Post, User
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    caching.stats_counter.flush()
+    cache.clear()
+
+
+def test_value_cached_until_invalidated():
+    values = iter(range(3))
+    assert caching.get_or_compute("key", lambda: next(values), 60, ("tag",)) == 0
+    assert caching.get_or_compute("key", lambda: next(values), 60, ("tag",)) == 0
+    caching.invalidate("tag")
+    assert caching.get_or_compute("key", lambda: next(values), 60, ("tag",)) == 1
+    assert caching.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "stampedes": 0,
+        "stale_served": 0,
+    }
+
+
+def test_stale_value_served_while_locked(settings):
+    settings.CACHE_JITTER = 0.5
+    caching.get_or_compute("key", lambda: "old", 60, ("tag",))
+    assert 29 < cache.get("swr:value:key")[1] - time.time() <= 60
+    caching.invalidate("tag")
+    cache.add("swr:lock:key", 1)
+    assert caching.get_or_compute("key", lambda: "new", 60, ("tag",)) == "old"
+    cache.delete("swr:lock:key")
+    assert caching.get_or_compute("key", lambda: "new", 60, ("tag",)) == "new"
+    assert caching.stats()["stale_served"] == 1
+
+
+def test_waits_for_value_without_stale_one(settings):
+    settings.CACHE_LOCK_TIMEOUT = 0.1
+    cache.add("swr:lock:key", 1)
+    assert caching.get_or_compute("key", lambda: "computed", 60) == "computed"
+    assert caching.stats()["stampedes"] == 1
+
+
+@pytest.mark.django_db
+def test_pages_cached_until_content_changes():
+    user = User.objects.create_user(username="user_1")
+    Post.objects.create(author=user, text="first post")
+    assert "first post" in str(Client().get("/").content)
+    Post.objects.filter(text="first post").update(text="updated post")
+    assert "first post" in str(Client().get("/").content)
+    Post.objects.create(author=user, text="second post")
+    content = str(Client().get("/").content)
+    assert "updated post" in content and "second post" in content
+    staff = User.objects.create_user(username="staff", is_staff=True)
+    client = Client()
+    client.force_login(staff)
+    stats = client.get("/staff/cache").json()
+    assert stats["hits"] >= 1 and "l1_hit_rate" in stats["tiered"]
+
+
+@pytest.mark.django_db
+def test_pages_invalidated_by_their_tags_only():
+    user_1 = User.objects.create_user(username="user_1")
+    user_2 = User.objects.create_user(username="user_2")
+    group = Group.objects.create(title="cats", slug="cats", description="")
+    Post.objects.create(author=user_1, group=group, text="first post")
+    for path in ("/", "/groups/cats/posts", "/user_2/posts"):
+        Client().get(path)
+    Post.objects.update(text="updated post")
+    Follow.objects.create(follower=user_1, followee=user_2)
+    assert "first post" in str(Client().get("/").content)
+    Post.objects.create(author=user_2, text="second post")
+    assert "updated post" in str(Client().get("/").content)
+    assert "first post" in str(Client().get("/groups/cats/posts").content)
+    assert "second post" in str(Client().get("/user_2/posts").content)
+
+
+def test_tiered_cache_broadcasts_invalidations(settings):
+    settings.TIERED_CACHE_SYNC_INTERVAL = 0
+    # Two processes' caches.
+    first, second = tiered.TieredCache(), tiered.TieredCache()
+    values = iter(range(3))
+    assert first.get_or_set("key", lambda: next(values)) == 0
+    assert first.get_or_set("key", lambda: next(values)) == 0
+    assert second.get_or_set("key", lambda: next(values)) == 0
+    first.invalidate("key")
+    assert second.get_or_set("key", lambda: next(values)) == 1
+    assert first.get_or_set("key", lambda: next(values)) == 1
+    second.stats()
+    assert first.stats() == {
+        "l1_hits": 1,
+        "l2_hits": 2,
+        "misses": 2,
+        "l1_hit_rate": 0.2,
+        "l2_hit_rate": 0.5,
+    }
+
+
+def test_tiered_cache_skips_values_invalidated_while_computed(settings):
+    settings.TIERED_CACHE_SYNC_INTERVAL = 0
+    first, second = tiered.TieredCache(), tiered.TieredCache()
+
+    def compute():
+        second.invalidate("key")
+        return "stale"
+
+    assert first.get_or_set("key", compute) == "stale"
+    assert first.get_or_set("key", lambda: "fresh") == "fresh"
+    assert second.get_or_set("key", lambda: "other") == "fresh"
+
+
+def test_tiered_cache_bounds(settings):
+    settings.TIERED_CACHE_SYNC_INTERVAL = 0
+    settings.TIERED_CACHE_MAX_ENTRIES = settings.TIERED_CACHE_LOG_SIZE = 2
+    first, second = tiered.TieredCache(), tiered.TieredCache()
+    for key in "abc":
+        first.get_or_set(key, lambda: key)
+        second.get_or_set(key, lambda: key)
+    assert list(first.entries) == ["b", "c"]
+    first.invalidate("x", "y", "z")
+    second.get_or_set("c", lambda: "c")
+    # More invalidations than the ring holds clear the whole cache.
+    assert list(second.entries) == ["c"]
+
+
+@pytest.mark.django_db
+def test_lookups_invalidated_on_save():
+    group = Group.objects.create(title="cats", slug="cats", description="")
+    assert tiered.group_by_slug("cats") == group
+    group.slug = "dogs"
+    group.save()
+    assert tiered.group_by_slug("dogs") == group
+    with pytest.raises(Http404):
+        tiered.group_by_slug("cats")
+    user = User.objects.create_user(username="user_1")
+    assert tiered.active_user("user_1") == user
+    user.is_active = False
+    user.save()
+    with pytest.raises(Http404):
+        tiered.active_user("user_1")
@@ -0,0 +1,250 @@
+import datetime as dt
+import gzip
+import json
+
+import brotli
+import pytest
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client
+
+from posts import activity, caching, likes, traffic
+from posts.indexing import index_texts
+from posts.models import (
+    Comment,
+    Follow,
+    Group,
+    GroupActivity,
+    Hashtag,
+    Like,
+    Mention,
+    Post,
+    User,
+    UserActivity,
+    UserDeletion,
+)
+
+
+@pytest.mark.django_db
+class Tests:
+    """
+    Tests are grouped by management commands.
+    """
+
+    # Fixtures and utilities -----------------------------------------------------------
+
+    @pytest.fixture(autouse=True)
+    def prepopulated_data(self):
+        self.user_1 = User.objects.create_user(username="user_1")
+        self.user_2 = User.objects.create_user(username="user_2")
+        self.group_1 = Group.objects.create(
+            title="cats", slug="cats", description="we like cats"
+        )
+        self.post_1 = Post.objects.create(author=self.user_1, text='with "quotes"')
+        self.post_2 = Post.objects.create(
+            author=self.user_2, group=self.group_1, text=""
+        )
+        self.comment_1 = Comment.objects.create(
+            author=self.user_2, text="comment", post=self.post_1
+        )
+        Follow.objects.create(follower=self.user_1, followee=self.user_2)
+
+    def snapshot(self):
+        return [
+            list(model.objects.order_by("pk").values())
+            for model in (User, Group, Post, Comment, Follow)
+        ]
+
+    # Test export_data and import_data -------------------------------------------------
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("filename", ["dump.ndjson", "dump.ndjson.gz"])
+    def test_export_import_round_trip(self, tmp_path, filename):
+        dump, before = str(tmp_path / filename), self.snapshot()
+        call_command("export_data", dump, chunk_size=2)
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command("import_data", dump, chunk_size=2, defer_indexes=True)
+        assert self.snapshot() == before
+        assert Post.objects.create(author=self.user_1, text="new").pk > self.post_2.pk
+
+    def test_import_resume_skips_existing_rows(self, tmp_path):
+        dump, before = str(tmp_path / "dump.ndjson"), self.snapshot()
+        call_command("export_data", dump)
+        with open(dump + ".checkpoint", "w") as checkpoint:
+            checkpoint.write('{"line": 3, "indexes": []}')
+        call_command("import_data", dump, resume=True)
+        assert self.snapshot() == before
+
+    # Test collectstatic ---------------------------------------------------------------
+
+    def test_collectstatic_precompressed_manifest(self, tmp_path, settings):
+        settings.STATIC_ROOT = str(tmp_path)
+        settings.STATICFILES_STORAGE = (
+            "posts.storage.PrecompressedManifestStaticFilesStorage"
+        )
+        call_command("collectstatic", interactive=False, verbosity=0)
+        with open(tmp_path / "staticfiles.json") as manifest:
+            hashed = json.load(manifest)["paths"]["bootstrap/css/bootstrap.min.css"]
+        assert hashed != "bootstrap/css/bootstrap.min.css"
+        with open(tmp_path / hashed, "rb") as original, gzip.open(
+            tmp_path / (hashed + ".gz")
+        ) as compressed:
+            content = original.read()
+            assert compressed.read() == content
+        with open(tmp_path / (hashed + ".br"), "rb") as compressed:
+            assert brotli.decompress(compressed.read()) == content
+        assert static("bootstrap/css/bootstrap.min.css") == "/static/" + hashed
+
+    # Test send_digests ----------------------------------------------------------------
+
+    def test_send_digests(self, tmp_path):
+        self.user_1.email = "user_1@example.com"
+        self.user_1.save()
+        deleted = User.objects.create_user(
+            username="deleted", email="deleted@example.com", is_active=False
+        )
+        Follow.objects.create(follower=deleted, followee=self.user_2)
+        tomorrow = dt.date.today() + dt.timedelta(days=1)
+        checkpoint = str(tmp_path / "digests.json")
+        for _ in range(2):
+            call_command(
+                "send_digests", date=tomorrow, processes=0, checkpoint=checkpoint
+            )
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ["user_1@example.com"]
+        assert f"/user_2/posts/{self.post_2.id}" in mail.outbox[0].body
+        assert f"/user_1/posts/{self.post_1.id}" not in mail.outbox[0].body
+
+    # Test purge_deleted ---------------------------------------------------------------
+
+    def test_purge_deleted(self):
+        kept = Post.objects.create(author=self.user_1, text="kept")
+        comment = Comment.objects.create(author=self.user_2, text="@user_1", post=kept)
+        reply = Comment.objects.create(
+            author=self.user_1, text="#reply", post=kept, parent=comment
+        )
+        Comment.objects.create(
+            author=self.user_2, text="nested", post=kept, parent=reply
+        )
+        index_texts(posts=[self.post_2], comments=Comment.objects.all())
+        for user in (self.user_1, self.user_2):
+            likes.like(user, kept)
+        assert likes.like_counts([kept.id]) == {kept.id: 2}
+        Post.objects.filter(id=self.post_1.id).update(is_deleted=True)
+        UserDeletion.objects.create(user=self.user_2)
+        call_command("purge_deleted", batch_size=1, pause=0)
+        assert list(User.objects.all()) == [self.user_1]
+        assert list(Post.objects.all()) == [kept]
+        assert list(Like.objects.values_list("user", flat=True)) == [self.user_1.id]
+        assert likes.like_counts([kept.id]) == {kept.id: 1}
+        for model in (Comment, Follow, Hashtag, Mention, UserDeletion):
+            assert not model.objects.exists()
+        assert set(UserActivity.objects.values_list("user", flat=True)) == {
+            self.user_1.id
+        }
+
+    # Test index_tags ------------------------------------------------------------------
+
+    def test_index_tags(self):
+        Post.objects.filter(pk=self.post_2.pk).update(text="#Cats and @user_1")
+        Comment.objects.filter(pk=self.comment_1.pk).update(text="@user_2 @nobody #x")
+        for _ in range(2):
+            call_command("index_tags", batch_size=1, pause=0)
+        assert sorted(Hashtag.objects.values_list("tag", "post", "comment")) == [
+            ("cats", self.post_2.pk, None),
+            ("x", self.post_1.pk, self.comment_1.pk),
+        ]
+        assert sorted(Mention.objects.values_list("user", "post", "comment")) == [
+            (self.user_1.pk, self.post_2.pk, None),
+            (self.user_2.pk, self.post_1.pk, self.comment_1.pk),
+        ]
+
+    # Test compact_activity ------------------------------------------------------------
+
+    def today_activity(self):
+        return (
+            activity.user_activity(self.user_1, days=1)
+            + activity.user_activity(self.user_2, days=1)
+            + activity.group_activity(self.group_1, days=1)
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_compact_activity(self):
+        Post.objects.create(author=self.user_1, text="second")
+        before = self.today_activity()
+        assert [day["posts"] for day in before] == [2, 1, 1]
+        assert UserActivity.objects.filter(user=self.user_1).count() == 2
+        call_command("compact_activity")
+        assert UserActivity.objects.filter(user=self.user_1).count() == 1
+        assert UserActivity.objects.filter(user=self.user_2).count() == 1
+        assert self.today_activity() == before
+        UserActivity.objects.all().delete()
+        GroupActivity.objects.all().delete()
+        call_command("compact_activity", backfill=True, range_days=1, processes=0)
+        assert self.today_activity() == before
+        assert before[1]["comments"] == before[1]["followers"] == 1
+
+    # Test warm_cache ------------------------------------------------------------------
+
+    @pytest.mark.django_db(transaction=True)
+    def test_warm_cache(self, capsys):
+        cache.clear()
+        call_command("warm_cache", index_pages=2, processes=0)
+        # Index page 2 does not exist, the profiles of both users and the group do.
+        assert "Warmed 4 pages (0 failed)" in capsys.readouterr().err
+        hits = caching.stats()["hits"]
+        for path in ("/", "/user_1/posts", "/user_2/posts", "/groups/cats/posts"):
+            Client().get(path)
+        assert caching.stats()["hits"] == hits + 4
+        call_command("warm_cache", budget=0, processes=0)
+        assert "Warmed 0 pages (0 failed)" in capsys.readouterr().err
+
+    # Test replay_traffic --------------------------------------------------------------
+
+    @pytest.mark.django_db(transaction=True)
+    def test_replay_traffic(self, live_server, tmp_path, capsys):
+        log = tmp_path / "traffic.ndjson"
+        entries = [
+            ("GET", "index_posts", {}, None, 2),
+            ("GET", "profile_posts", {"username": "user_1"}, None, None),
+            ("GET", "subscriptions_posts", {}, self.user_1.pk, None),
+            ("POST", "new_post", {}, self.user_1.pk, None),
+            ("GET", "download_profile", {"filename": "missing"}, None, None),
+        ]
+        log.write_text(
+            "".join(
+                json.dumps(
+                    {
+                        "t": 1000 + i / 100,
+                        "m": method,
+                        "r": route,
+                        "k": {k: traffic.anonymize(v) for k, v in kwargs.items()},
+                        "u": traffic.anonymize(user) if user else None,
+                        "p": page,
+                        "s": 200,
+                        "d": 10,
+                    }
+                )
+                + "\n"
+                for i, (method, route, kwargs, user, page) in enumerate(entries)
+            )
+        )
+        call_command(
+            "replay_traffic", str(log), base_url=live_server.url, concurrency=2
+        )
+        report = {
+            line.split()[0]: line.split()[1:]
+            for line in capsys.readouterr().out.splitlines()[1:]
+        }
+        assert set(report) == {
+            "index_posts",
+            "new_post",
+            "profile_posts",
+            "subscriptions_posts",
+            "total",
+        }
+        assert report["total"][:2] == ["4", "0.0%"]
+        assert Post.objects.filter(text="Replayed post").exists()
@@ -1,7 +1,21 @@
+import os
+import time
+
 import pytest
+from django.core.cache import cache
 from django.test import Client
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts import threads, traffic, viewcounts
+from posts.models import (
+    Comment,
+    Follow,
+    Group,
+    Like,
+    LikeCounter,
+    Post,
+    User,
+    UserDeletion,
+)
 
 
 USERNAME_1, USERNAME_2 = "user_1", "user_2"
@@ -22,7 +36,9 @@ class Tests:
     # Fixtures and utilities -----------------------------------------------------------
 
     @pytest.fixture(autouse=True)
-    def prepopulated_data(self):
+    def prepopulated_data(self, settings):
+        # Views are flushed explicitly rather than by a background thread.
+        settings.VIEW_FLUSH_INTERVAL = 0
         self.user_1 = User.objects.create_user(username=USERNAME_1)
         self.user_2 = User.objects.create_user(username=USERNAME_2)
         self.group_1 = Group.objects.create(
@@ -113,6 +129,14 @@ class Tests:
             None,
         )
 
+    def test_activity(self):
+        page = Client().get(f"/{USERNAME_2}/posts")
+        today = page.context["activity"][-1]
+        assert (today["posts"], today["comments"], today["followers"]) == (2, 1, 1)
+        page = Client().get(f"/groups/{GROUP_SLUG}/posts")
+        assert page.context["activity"][-1]["posts"] == 1
+        assert "Last 30 days" in str(page.content)
+
     def test_followers(self):
         self.assert_contains(f"@{USERNAME_1}", f"/{USERNAME_2}/followers", self.user_2)
         assert (
@@ -169,6 +193,139 @@ class Tests:
             self.user_2,
         )
 
+    def test_view_counts(self):
+        for user in (self.user_1, self.user_2, self.user_2):
+            self.user_client(user).get(f"/{USERNAME_1}/posts/{self.post_1.id}")
+        viewcounts.view_counter.flush()
+        cache.clear()
+        page = self.user_client(self.user_2).get(f"/{USERNAME_1}/posts")
+        (post,) = page.context["page_obj"]
+        assert (post.view_count, post.viewer_count) == (3, 2)
+        assert "fa-eye" in str(page.content)
+        sketch = viewcounts.new_sketch()
+        for i in range(1000):
+            viewcounts.sketch_add(sketch, i)
+        assert 900 < viewcounts.sketch_count(sketch) < 1100
+
+    def test_streaming(self, settings):
+        settings.STREAMING_RESPONSES = True
+        client = self.user_client(self.user_1)
+        response = client.get(f"/{USERNAME_1}/posts/{self.post_1.id}")
+        assert response.streaming
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        assert "<nav" in chunks[0] and USER_1_INIT_POST_TEXT in chunks[0]
+        assert USER_2_COMMENT_TEXT in chunks[1] and USER_1_COMMENT_TEXT in chunks[2]
+        assert "Edit" not in chunks[1] and "Edit" in chunks[2]
+        assert "Write a comment" in chunks[3]
+        response = client.get(f"/{USERNAME_2}/followers")
+        content = b"".join(response.streaming_content).decode()
+        assert f"@{USERNAME_1}" in content and content.rstrip().endswith("</html>")
+
+    def test_tag_and_mention_posts(self):
+        client = self.user_client(self.user_2)
+        for i in range(3):
+            client.post("/post", {"text": f"post {i} #Dogs for @{USERNAME_1}"})
+        client.post(f"/{USERNAME_1}/posts/{self.post_1.id}/comment", {"text": "#dogs"})
+        texts = [f"post {i} #" for i in range(3)]
+        page = self.user_client(self.user_1).get("/tags/DOGS/posts")
+        assert [post.text[:8] for post in page.context["page_obj"]] == texts[::-1]
+        assert USER_1_INIT_POST_TEXT not in str(page.content)
+        page = self.user_client(self.user_1).get("/mentions")
+        cursor = page.context["page_obj"].object_list[1].id
+        page = self.user_client(self.user_1).get(f"/mentions?before={cursor}")
+        assert [post.text[:8] for post in page.context["page_obj"]] == texts[:1]
+        self.assert_not_contains("post 0 #", "/mentions", self.user_2)
+        assert Client().get("/mentions").status_code == 302
+
+    def test_syndication(self):
+        url = f"/{USERNAME_2}/posts.atom"
+        response = Client().get(url)
+        assert response["Content-Type"].startswith("application/atom+xml")
+        assert USER_2_INIT_POST_TEXT in str(response.content)
+        assert USER_1_INIT_POST_TEXT not in str(response.content)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        assert Client().get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert (
+            Client().get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+        )
+        Post.objects.create(author=self.user_2, text="user 2 syndicated text")
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        assert "user 2 syndicated text" in str(response.content)
+        response = Client().get(f"/groups/{GROUP_SLUG}/posts.rss")
+        assert response["Content-Type"].startswith("application/rss+xml")
+        assert USER_2_GROUP_POST_TEXT in str(response.content)
+        assert USER_1_INIT_POST_TEXT in str(Client().get("/posts.atom").content)
+        assert Client().get("/posts.json").status_code == 404
+        assert Client().get("/nobody/posts.atom").status_code == 404
+
+    def test_pages_viewer_independent(self):
+        for url in ("/", f"/groups/{GROUP_SLUG}/posts", f"/{USERNAME_1}/posts"):
+            responses = [
+                self.user_client(user).get(url) if user else Client().get(url)
+                for user in (self.user_1, self.user_2, None)
+            ]
+            assert len({response.content for response in responses}) == 1
+            assert all(
+                "Cookie" not in response.get("Vary", "") for response in responses
+            )
+
+    def test_viewer(self):
+        response = self.user_client(self.user_1).get(
+            f"/viewer?posts={self.post_1.id},{self.post_2.id}"
+            f"&authors={USERNAME_1},{USERNAME_2}"
+        )
+        assert response.json() == {
+            "username": USERNAME_1,
+            "editable_posts": [self.post_1.id],
+            "liked_posts": [],
+            "follows": [USERNAME_2],
+            "unread": {},
+        }
+        assert Client().get("/viewer").json()["username"] is None
+        assert Client().get("/viewer?demo_login=1").json()["username"] == "testuser"
+
+    def test_unread_badges(self, settings):
+        settings.UNREAD_CAP = 1
+        client = self.user_client(self.user_1)
+        unread = client.get(f"/viewer?feed=/feed&seen={self.post_2.id}").json()
+        assert unread["unread"]["subscriptions"]["badge"] == "1"
+        Post.objects.create(author=self.user_2, text="user 2 unread post text")
+        assert client.get("/viewer").json()["unread"]["subscriptions"]["count"] == 1
+        cache.clear()
+        assert client.get("/viewer").json()["unread"]["subscriptions"]["badge"] == "1+"
+        unread = client.get(f"/viewer?feed=/feed&seen={self.post_3.id}").json()
+        assert unread["unread"]["subscriptions"]["count"] == 1
+        unread = client.get(f"/viewer?feed=/feed&seen={self.post_1.id}").json()
+        assert unread["unread"]["subscriptions"]["count"] == 1
+        group_feed = f"/groups/{GROUP_SLUG}/posts"
+        assert "group:cats" not in client.get("/viewer").json()["unread"]
+        unread = client.get(f"/viewer?feed={group_feed}&seen={self.post_1.id}").json()
+        assert unread["unread"]["group:cats"]["title"] == "cats"
+        assert unread["unread"]["group:cats"]["count"] == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_posts(self, settings):
+        settings.NEW_POSTS_TIMEOUT, settings.NEW_POSTS_POLL_INTERVAL = 0.1, 0
+        client, after = self.user_client(self.user_1), self.post_3.id
+        assert client.get(f"/updates?feed=/&after={after}").json()["count"] == 0
+        client.post("/post", {"text": "user 1 live post text"})
+        update = client.get(f"/updates?feed=/&after={after}").json()
+        assert update["count"] == 1
+        assert "user 1 live post text" in update["cards"][0]
+        assert update["newest_id"] == Post.objects.get(text="user 1 live post text").id
+        update = client.get(f"/updates?feed=/groups/{GROUP_SLUG}/posts&after={after}")
+        assert update.json()["count"] == 0
+        assert update.json()["newest_id"] >= after
+        client.post(
+            "/post", {"text": "user 1 #live group post", "group": self.group_1.id}
+        )
+        for feed in (f"/groups/{GROUP_SLUG}/posts", "/tags/live/posts"):
+            update = client.get(f"/updates?feed={feed}&after={after}").json()
+            assert update["count"] == 1
+            assert "group post" in update["cards"][0]
+        assert Client().get(f"/updates?feed=/feed&after={after}").status_code == 403
+        assert client.get(f"/updates?feed=/post&after={after}").status_code == 400
+
     # Test actions ---------------------------------------------------------------------
 
     def test_new_post(self):
@@ -184,8 +341,35 @@ class Tests:
         )
         self.assert_contains(post_text, "/feed", self.user_1)
 
+    def test_like(self, settings):
+        settings.LIKE_COUNTER_SHARDS = 2
+        url = f"/{USERNAME_2}/posts/{self.post_2.id}"
+        for user in (self.user_1, self.user_1, self.user_2):
+            response = self.user_client(user).post(f"{url}/like?next=/", follow=True)
+            assert response.redirect_chain[-1][0] == "/"
+        assert self.user_client(self.user_2).get(f"{url}/unlike").status_code == 405
+        response = self.user_client(self.user_2).post(f"{url}/unlike")
+        assert response.url == url
+        self.user_client(self.user_2).post(f"{url}/unlike?next=https://example.com/")
+        assert list(Like.objects.values_list("user", "post")) == [
+            (self.user_1.id, self.post_2.id)
+        ]
+        assert LikeCounter.objects.count() <= 2
+        cache.clear()
+        page = self.user_client(self.user_1).get(f"/{USERNAME_2}/posts")
+        assert [post.like_count for post in page.context["page_obj"]] == [0, 1]
+        viewer = self.user_client(self.user_1).get(f"/viewer?posts={self.post_2.id}")
+        assert viewer.json()["liked_posts"] == [self.post_2.id]
+        assert settings.CSRF_COOKIE_NAME in viewer.cookies
+        page = self.user_client(self.user_1).get("/liked")
+        assert list(page.context["page_obj"]) == [self.post_2]
+
     def test_follow(self):
-        response = self.user_client(self.user_2).get(
+        assert (
+            self.user_client(self.user_2).get(f"/{USERNAME_1}/follow").status_code
+            == 405
+        )
+        response = self.user_client(self.user_2).post(
             f"/{USERNAME_1}/follow", follow=True
         )
         assert response.redirect_chain[-1][0] == f"/{USERNAME_1}/posts"
@@ -198,7 +382,7 @@ class Tests:
         self.assert_contains(f"@{USERNAME_1}", f"/{USERNAME_2}/followees", self.user_2)
 
     def test_unfollow(self):
-        response = self.user_client(self.user_1).get(
+        response = self.user_client(self.user_1).post(
             f"/{USERNAME_2}/unfollow", follow=True
         )
         assert response.redirect_chain[-1][0] == f"/{USERNAME_2}/posts"
@@ -271,6 +455,72 @@ class Tests:
         )
         self.assert_contains(user_2_new_text, "/feed", self.user_1)
         self.assert_contains(user_2_new_text, "", self.user_1, self.user_2, None)
+        self.user_client(self.user_2).post(
+            f"/{USERNAME_2}/posts/{self.post_2.id}/edit", {"text": "#cats"}
+        )
+        self.assert_contains('href="/tags/cats/posts"', "/tags/cats/posts", None)
+        self.user_client(self.user_2).post(
+            f"/{USERNAME_2}/posts/{self.post_2.id}/edit", {"text": "#dogs"}
+        )
+        self.assert_not_contains("#dogs", "/tags/cats/posts", None)
+
+    def test_comment_threads(self, settings, django_assert_num_queries):
+        settings.COMMENT_PAGE_SIZE = settings.COMMENT_REPLIES_SHOWN = 2
+        settings.COMMENT_THREAD_DEPTH = 1
+        client = self.user_client(self.user_1)
+        for i in range(3):
+            response = client.post(
+                f"/{USERNAME_2}/comments/{self.comment_1.id}/reply",
+                {"text": f"reply {i}"},
+            )
+        reply = Comment.objects.get(text="reply 2")
+        assert (
+            response.url == f"/{USERNAME_1}/posts/{self.post_1.id}#comment_{reply.id}"
+        )
+        reply = Comment.objects.get(text="reply 0")
+        client.post(f"/{USERNAME_1}/comments/{reply.id}/reply", {"text": "nested"})
+        nested = Comment.objects.get(text="nested")
+        assert (reply.parent, reply.depth, nested.depth) == (self.comment_1, 1, 2)
+        assert nested.path.startswith(reply.path)
+        Comment.objects.create(author=self.user_2, text="third", post=self.post_1)
+        with django_assert_num_queries(2):
+            comments, after = threads.load_thread(self.post_1)
+        assert [c.text for c in comments] == [USER_2_COMMENT_TEXT, USER_1_COMMENT_TEXT]
+        replies = comments[0].thread_replies
+        assert [c.text for c in replies] == ["reply 0", "reply 1"]
+        assert comments[0].more_replies == replies[0].more_replies == 1
+        assert replies[0].thread_replies == []
+        page = client.get(f"/{USERNAME_1}/posts/{self.post_1.id}").content.decode()
+        assert page.count("Show 1 more reply") == 2 and "third" not in page
+        fragment = client.get(
+            f"/{USERNAME_2}/comments/{self.comment_1.id}/replies",
+            {"after": comments[0].replies_after},
+        ).content.decode()
+        assert "reply 2" in fragment and "reply 1" not in fragment
+        fragment = client.get(
+            f"/{USERNAME_1}/comments/{reply.id}/replies", {"after": ""}
+        ).content.decode()
+        assert "nested" in fragment
+        fragment = client.get(
+            f"/{USERNAME_1}/posts/{self.post_1.id}/comments", {"after": after}
+        ).content.decode()
+        assert "third" in fragment and "reply 0" not in fragment
+        assert (
+            client.post(
+                f"/{USERNAME_1}/comments/{self.comment_1.id}/reply", {"text": "x"}
+            ).status_code
+            == 404
+        )
+        replies = f"/{USERNAME_2}/comments/{self.comment_1.id}/replies"
+        assert Client().get(replies).status_code == 302
+        User.objects.filter(id=self.user_1.id).update(is_active=False)
+        assert self.user_client(self.user_2).get(replies).status_code == 404
+        assert (
+            self.user_client(self.user_2)
+            .post(f"/{USERNAME_2}/comments/{self.comment_1.id}/reply", {"text": "x"})
+            .status_code
+            == 404
+        )
 
     def test_edit_comment(self):
         new_comment_text = "user 2 updated comment text"
@@ -286,3 +536,151 @@ class Tests:
             self.user_1,
             self.user_2,
         )
+
+    # Test throttling and load shedding ------------------------------------------------
+
+    def test_follow_throttled(self, settings):
+        cache.clear()
+        settings.THROTTLE_USER_RATES = {"follow": (2, 60)}
+        client = self.user_client(self.user_2)
+        assert client.post(f"/{USERNAME_1}/follow").status_code == 302
+        assert client.post(f"/{USERNAME_1}/unfollow").status_code == 302
+        response = client.post(f"/{USERNAME_1}/follow")
+        assert response.status_code == 429
+        assert int(response["Retry-After"]) > 0
+        assert not Follow.objects.filter(
+            follower=self.user_2, followee=self.user_1
+        ).exists()
+
+    def test_writes_shed_when_overloaded(self, settings):
+        settings.SHED_MAX_QUEUE_TIME = 1
+        client = self.user_client(self.user_2)
+        queued = f"t={time.time() - 0.1:.3f}"
+        response = client.post("/post", {"text": "queued"}, HTTP_X_REQUEST_START=queued)
+        assert response.status_code == 302
+        # Milliseconds, as some proxies send.
+        queued = f"t={int((time.time() - 2) * 1000)}"
+        response = client.post(
+            "/post", {"text": "shed post text"}, HTTP_X_REQUEST_START=queued
+        )
+        assert response.status_code == 503
+        assert response["Retry-After"] == str(settings.SHED_RETRY_AFTER)
+        assert not Post.objects.filter(text="shed post text").exists()
+        assert client.get("/", HTTP_X_REQUEST_START=queued).status_code == 200
+
+    # Test admin -----------------------------------------------------------------------
+
+    def test_admin_changelists(self):
+        admin = User.objects.create_superuser(username="admin", password="admin")
+        client = self.user_client(admin)
+        for url in (
+            "/admin/posts/post/",
+            f"/admin/posts/post/?author={USERNAME_2}&group={GROUP_SLUG}",
+            "/admin/posts/comment/?date__gte=2020-01-01+00:00:00%2B00:00",
+            f"/admin/posts/post/?q={USERNAME_2}",
+            f"/admin/posts/follow/?q={USERNAME_1}",
+        ):
+            assert client.get(url).status_code == 200
+        response = client.get(f"/admin/posts/post/?author={USERNAME_2}")
+        assert list(response.context["cl"].result_list) == [self.post_3, self.post_2]
+        response = client.get(f"/admin/posts/follow/?q={USERNAME_1}")
+        assert response.context["cl"].result_count == 1
+        self.user_client(self.user_1).post("/post", {"text": "tagged #cats post"})
+        response = client.get("/admin/posts/post/", {"q": "#Cats"})
+        assert [post.text for post in response.context["cl"].result_list] == [
+            "tagged #cats post"
+        ]
+
+    def test_admin_soft_deletes(self):
+        client = self.user_client(
+            User.objects.create_superuser(username="admin", password="admin")
+        )
+        client.post(f"/admin/posts/post/{self.post_1.id}/delete/", {"post": "yes"})
+        client.post(f"/admin/auth/user/{self.user_2.id}/delete/", {"post": "yes"})
+        assert Post.objects.filter(id=self.post_1.id, is_deleted=True).exists()
+        assert User.objects.filter(id=self.user_2.id, is_active=False).exists()
+        assert UserDeletion.objects.filter(user=self.user_2).exists()
+        self.assert_not_contains(USER_1_INIT_POST_TEXT, "", self.user_1, None)
+        self.assert_not_contains(USER_2_INIT_POST_TEXT, "", self.user_1, None)
+        self.assert_not_contains(
+            USER_2_COMMENT_TEXT, f"/{USERNAME_1}/posts/{self.post_1.id}", self.user_1
+        )
+        assert Client().get(f"/{USERNAME_2}/posts").status_code == 404
+
+    def test_admin_soft_delete_action(self):
+        client = self.user_client(
+            User.objects.create_superuser(username="admin", password="admin")
+        )
+        assert Client().get(f"/{USERNAME_2}/posts").status_code == 200
+        feed = Client().get("/posts.atom")
+        assert USER_1_INIT_POST_TEXT in feed.content.decode()
+        assert USER_2_INIT_POST_TEXT in feed.content.decode()
+        client.post(
+            "/admin/posts/post/?is_deleted__exact=0",
+            {
+                "action": "delete_selected",
+                "_selected_action": [self.post_1.id],
+                "post": "yes",
+            },
+        )
+        assert Post.objects.filter(id=self.post_1.id, is_deleted=True).exists()
+        feed = Client().get("/posts.atom", HTTP_IF_NONE_MATCH=feed["ETag"])
+        assert feed.status_code == 200
+        assert USER_1_INIT_POST_TEXT not in feed.content.decode()
+        client.post(
+            "/admin/auth/user/",
+            {
+                "action": "delete_selected",
+                "_selected_action": [self.user_2.id],
+                "post": "yes",
+            },
+        )
+        assert UserDeletion.objects.filter(user=self.user_2).exists()
+        assert Client().get(f"/{USERNAME_2}/posts").status_code == 404
+        feed = Client().get("/posts.atom", HTTP_IF_NONE_MATCH=feed["ETag"])
+        assert feed.status_code == 200
+        assert USER_2_INIT_POST_TEXT not in feed.content.decode()
+
+    # Test profiler --------------------------------------------------------------------
+
+    def test_profiles(self, settings, tmp_path):
+        settings.PROFILER_DIR = str(tmp_path)
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        client = self.user_client(staff)
+        token = client.get("/staff/profiles").context["token"]
+        assert "X-Profile-Name" not in client.get("/?profile=invalid")
+        assert "X-Profile-Name" not in Client().get(f"/?profile={token}")
+        user_client = self.user_client(self.user_1)
+        assert "X-Profile-Name" not in user_client.get(f"/?profile={token}")
+        name = client.get(f"/{USERNAME_1}/posts?profile={token}")["X-Profile-Name"]
+        profile = client.get(f"/staff/profiles/{name}.json").getvalue()
+        assert b'"path": "/user_1/posts?profile=' in profile
+        assert b'"name": "profile_posts.html"' in profile
+        assert client.get(f"/staff/profiles/{name}.prof").status_code == 200
+        assert client.get("/staff/profiles").context["profiles"][0]["name"] == name
+        assert client.get("/staff/profiles/..%2Fsecret").status_code == 404
+        assert self.user_client(self.user_1).get("/staff/profiles").status_code == 302
+        settings.PROFILER_MAX_PROFILES = 1
+        client.get(f"/?profile={token}")
+        assert len(client.get("/staff/profiles").context["profiles"]) == 1
+        assert sorted(os.listdir(tmp_path))[0] > name
+
+    # Test traffic capture -------------------------------------------------------------
+
+    def test_traffic_capture(self, settings, tmp_path):
+        settings.TRAFFIC_CAPTURE_FILE = str(tmp_path / "traffic.ndjson")
+        settings.TRAFFIC_CAPTURE_RATE = 1
+        self.user_client(self.user_1).get(f"/{USERNAME_2}/posts?page=1")
+        Client().get(f"/{USERNAME_1}/posts.atom")
+        Client().get("/admin/login/")
+        profile, feed = traffic.read_log(settings.TRAFFIC_CAPTURE_FILE)
+        assert profile["r"] == "profile_posts" and profile["m"] == "GET"
+        assert profile["k"] == {"username": traffic.anonymize(USERNAME_2)}
+        assert profile["u"] == traffic.anonymize(self.user_1.pk)
+        assert profile["p"] == 1 and profile["s"] == 200 and profile["d"] > 0
+        assert feed["r"] == "profile_posts_feed" and feed["u"] is None
+        assert feed["k"] == {
+            "username": traffic.anonymize(USERNAME_1),
+            "format": "atom",
+        }
+        assert USERNAME_1 not in open(settings.TRAFFIC_CAPTURE_FILE).read()
@@ -0,0 +1,19 @@
+import pytest
+from django.db import connection
+
+from thepost import warmup
+
+
+def test_warm_templates():
+    assert warmup.warm_templates() > 0
+
+
+def test_warm_urls():
+    warmup.warm_urls()
+
+
+@pytest.mark.django_db
+def test_warm_database():
+    connection.close()
+    warmup.warm_database()
+    assert connection.connection is not None
@@ -30,10 +30,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "posts.middleware.LoadSheddingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "posts.middleware.ProfilerMiddleware",
+    "posts.middleware.TrafficCaptureMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -102,10 +105,130 @@ DATABASES = {
     }
 }
 
+# Cache
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Two-tier cache of hot lookups, see posts.tiered
+
+TIERED_CACHE_MAX_ENTRIES = 1000
+TIERED_CACHE_L1_TIMEOUT = 60
+TIERED_CACHE_TIMEOUT = 60 * 60
+# Seconds between checks for invalidations made by other processes.
+TIERED_CACHE_SYNC_INTERVAL = 1
+TIERED_CACHE_LOG_SIZE = 1000
+
+# Throttling and load shedding
+
+# scope: (bucket capacity, seconds for the bucket to refill completely), per
+# process unless the cache is shared, as in settings_production.
+THROTTLE_USER_RATES = {
+    "post": (10, 60),
+    "comment": (20, 60),
+    "follow": (30, 60),
+    "like": (60, 60),
+}
+THROTTLE_IP_RATES = {
+    "post": (50, 60),
+    "comment": (100, 60),
+    "follow": (150, 60),
+    "like": (300, 60),
+}
+# Seconds a request may wait for a worker, after the X-Request-Start time the
+# proxy stamps it with, before writes are shed.
+SHED_MAX_QUEUE_TIME = float(os.getenv("SHED_MAX_QUEUE_TIME", 1))
+SHED_MAX_DB_LATENCY = float(os.getenv("SHED_MAX_DB_LATENCY", 0.5))
+SHED_RETRY_AFTER = 5
+
+# Live updates
+
+NEW_POSTS_TIMEOUT = 25
+NEW_POSTS_POLL_INTERVAL = 1
+
+# Likes, see posts.likes
+
+LIKE_COUNTER_SHARDS = 16
+LIKE_COUNT_CACHE_TIMEOUT = 60
+
+# Activity graphs, see posts.activity
+
+ACTIVITY_DAYS = 30
+
+# Unread badges, see posts.unread
+
+UNREAD_CAP = 99
+UNREAD_CACHE_TIMEOUT = 30
+
+# Post view counting, see posts.viewcounts
+
+VIEW_FLUSH_INTERVAL = int(os.getenv("VIEW_FLUSH_INTERVAL", 10))
+VIEW_BUFFER_MAX_POSTS = 1000
+VIEW_UNIQUE_VIEWERS = bool(int(os.getenv("VIEW_UNIQUE_VIEWERS", 1)))
+VIEW_COUNT_CACHE_TIMEOUT = 60
+
+# Comment threads, see posts.threads
+
+# Top-level comments, or replies, loaded at a time.
+COMMENT_PAGE_SIZE = 50
+# Replies shown under each comment before "show more replies".
+COMMENT_REPLIES_SHOWN = 3
+# Levels of replies shown below a window of comments.
+COMMENT_THREAD_DEPTH = 3
+
+# Streaming of long pages, see posts.views.StreamingMixin
+
+STREAMING_RESPONSES = bool(int(os.getenv("STREAMING_RESPONSES", 0)))
+STREAM_CHUNK_SIZE = 100
+
+# Atom and RSS feeds
+
+SYNDICATION_ITEMS = 20
+SYNDICATION_CACHE_TIMEOUT = 60 * 60
+
+# Page and fragment caching, see posts.caching
+
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", 10))
+# Expired values are still served for this long while one worker recomputes them.
+CACHE_STALE_TIMEOUT = 5 * 60
+CACHE_LOCK_TIMEOUT = 10
+# Cache timeouts are shortened by up to this fraction at random.
+CACHE_JITTER = 0.2
+
+# Profiling
+
+PROFILER_DIR = os.getenv("PROFILER_DIR", os.path.join(BASE_DIR, "profiles"))
+# Profile one in this many requests, 0 to only profile on demand.
+PROFILER_SAMPLE_RATE = int(os.getenv("PROFILER_SAMPLE_RATE", 0))
+PROFILER_TOKEN_MAX_AGE = 60 * 60
+# The oldest profiles are removed beyond this many, or this many bytes.
+PROFILER_MAX_PROFILES = 200
+PROFILER_MAX_BYTES = 100 * 1024 * 1024
+
+# Traffic capture, see posts.traffic and the replay_traffic command
+
+TRAFFIC_CAPTURE_FILE = os.getenv(
+    "TRAFFIC_CAPTURE_FILE", os.path.join(BASE_DIR, "traffic.ndjson")
+)
+# Capture one in this many requests, 0 to capture none.
+TRAFFIC_CAPTURE_RATE = int(os.getenv("TRAFFIC_CAPTURE_RATE", 0))
+
 # Static files
 
 STATIC_URL = "/static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
+STATIC_ROOT = os.getenv("STATIC_ROOT", os.path.join(BASE_DIR, "staticfiles"))
+# Set to posts.storage.PrecompressedManifestStaticFilesStorage to have
+# collectstatic write fingerprinted, precompressed files and a manifest.
+STATICFILES_STORAGE = os.getenv(
+    "STATICFILES_STORAGE", "django.contrib.staticfiles.storage.StaticFilesStorage"
+)
 
 # Media files
 
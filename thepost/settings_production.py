@@ -0,0 +1,28 @@
+"""
+Production settings: the base settings without development-only apps and
+middleware, with persistent database connections and a cache shared by every
+process.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES, INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = False
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != "debug_toolbar"]
+MIDDLEWARE = [
+    middleware
+    for middleware in MIDDLEWARE
+    if not middleware.startswith("debug_toolbar.")
+]
+
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("CONN_MAX_AGE", 600))
+
+# Throttles, cached pages and the invalidations of the tiered cache only hold
+# across workers and services when they share the cache.
+CACHES["default"]["BACKEND"] = os.getenv(
+    "CACHE_BACKEND", "django.core.cache.backends.memcached.MemcachedCache"
+)
+CACHES["default"]["LOCATION"] = os.getenv("CACHE_LOCATION", "memcached:11211")
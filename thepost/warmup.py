@@ -0,0 +1,48 @@
+"""
+Warm-up run by gunicorn (see gunicorn.conf.py) before workers accept traffic,
+so that the first requests do not pay for template compilation, building the
+URL resolver and connecting to the database.
+"""
+
+import os
+
+from django.apps import apps
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+TEMPLATE_APPS = ["posts", "users"]
+
+
+def warm_templates():
+    """
+    Compiles every template of TEMPLATE_APPS into the cached template loader.
+    Returns the number of templates compiled.
+    """
+    count = 0
+    for label in TEMPLATE_APPS:
+        templates_dir = os.path.join(apps.get_app_config(label).path, "templates")
+        for root, _, filenames in os.walk(templates_dir):
+            for filename in filenames:
+                if filename.endswith((".html", ".txt")):
+                    get_template(
+                        os.path.relpath(os.path.join(root, filename), templates_dir)
+                    )
+                    count += 1
+    return count
+
+
+def warm_urls():
+    """
+    Builds the URL resolver's reverse lookup tables.
+    """
+    get_resolver().reverse_dict
+
+
+def warm_database():
+    """
+    Opens the connection of every database, which stays open for
+    CONN_MAX_AGE seconds.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()